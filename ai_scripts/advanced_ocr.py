@@ -11,42 +11,114 @@ import nltk
 from nltk.tokenize import word_tokenize, sent_tokenize
 import string
 import json
+import time
+import hashlib
+from collections import deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.util import Finalize
+from itertools import groupby
+from disk_cache import CACHE_DIR, DiskCache, cache_key
+
+OCR_CACHE_PATH = os.path.join(CACHE_DIR, 'ocr.sqlite')
 
 class TextCorrector:
-    def __init__(self):
-        """Initialize text correction tools"""
+    def __init__(self, cache_size=50000, max_edit2_length=None):
+        """Initialize text correction tools
+
+        cache_size bounds the LRU cache of spelling corrections, which is
+        shared by every page this corrector sees. Tokens longer than
+        max_edit2_length are only corrected at edit distance 1.
+        """
         self.spell = SpellChecker()
+        self.cache_size = cache_size
+        self.max_edit2_length = max_edit2_length
+        self._corrections = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
         try:
             nltk.data.find('tokenizers/punkt')
         except LookupError:
             nltk.download('punkt')
 
+    @staticmethod
+    def _should_check(word):
+        """Skip punctuation, numbers, and short words"""
+        return not (word in string.punctuation or
+                    word.isdigit() or
+                    len(word) <= 2)
+
+    def _correct(self, word):
+        """Spelling correction for a single unknown lowercase word"""
+        if self.max_edit2_length and len(word) > self.max_edit2_length:
+            # Edit-distance-2 candidates grow quadratically with word length
+            distance = self.spell.distance
+            self.spell.distance = 1
+            try:
+                return self.spell.correction(word)
+            finally:
+                self.spell.distance = distance
+        return self.spell.correction(word)
+
+    def correct_words(self, words):
+        """Map each distinct lowercase word to its correction
+
+        Known words and words without a correction map to None. Results are
+        kept in the LRU cache so repeated OCR mistakes are corrected once.
+        """
+        corrections = {}
+        missing = []
+        for word in set(words):
+            if word in self._corrections:
+                self._corrections.move_to_end(word)
+                corrections[word] = self._corrections[word]
+                self.cache_hits += 1
+            else:
+                missing.append(word)
+                self.cache_misses += 1
+
+        if missing:
+            # Check the whole batch in a single dictionary lookup
+            unknown = self.spell.unknown(missing)
+            for word in missing:
+                correction = self._correct(word) if word in unknown else None
+                corrections[word] = correction
+                self._corrections[word] = correction
+
+            while len(self._corrections) > self.cache_size:
+                self._corrections.popitem(last=False)
+
+        return corrections
+
+    def cache_stats(self):
+        """Hit-rate statistics of the correction cache"""
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            'hits': self.cache_hits,
+            'misses': self.cache_misses,
+            'hit_rate': round(self.cache_hits / lookups, 4) if lookups else 0.0,
+            'size': len(self._corrections),
+            'max_size': self.cache_size
+        }
+
     def fix_spelling(self, text):
         """Correct spelling errors"""
         words = word_tokenize(text)
+
+        # Each distinct token on the page is looked up once
+        corrections = self.correct_words(
+            word.lower() for word in words if self._should_check(word)
+        )
+
         corrected_words = []
-        
         for word in words:
-            # Skip punctuation, numbers, and short words
-            if (word in string.punctuation or 
-                word.isdigit() or 
-                len(word) <= 2):
-                corrected_words.append(word)
-                continue
-            
-            # Check if word is misspelled
-            if not self.spell.known([word.lower()]):
-                # Get the correction
-                correction = self.spell.correction(word.lower())
-                if correction:
-                    # Preserve original capitalization
-                    if word.istitle():
-                        correction = correction.title()
-                    elif word.isupper():
-                        correction = correction.upper()
-                    corrected_words.append(correction)
-                else:
-                    corrected_words.append(word)
+            correction = corrections.get(word.lower()) if self._should_check(word) else None
+            if correction:
+                # Preserve original capitalization
+                if word.istitle():
+                    correction = correction.title()
+                elif word.isupper():
+                    correction = correction.upper()
+                corrected_words.append(correction)
             else:
                 corrected_words.append(word)
 
@@ -104,77 +176,749 @@ class TextCorrector:
         
         return text.strip()
 
+class PagePreprocessor:
+    """Cheap page analysis and cleanup before tesseract
+
+    All measurements are vectorized NumPy on a copy of the page scaled to
+    analysis_height: an ink mask against the local background, projection
+    profiles for the content box and text lines, and a skew search. They are
+    then applied to the full-resolution page: rotate, crop to the content box
+    and denoise. Pages are classified as 'text', 'image' (photos, plates,
+    covers) or 'blank' (including bleed-through) so the caller can skip or
+    downscale what isn't worth a full tesseract pass.
+    """
+
+    def __init__(self, analysis_height=1000, ink_contrast=0.07, blank_ink=0.002,
+                 max_solid=0.03, min_text_lines=3, max_skew=5.0, margin=0.01,
+                 image_scale=0.5, skip_images=False, denoise=True):
+        """ink_contrast is how much darker than the local background (as a
+        fraction of the paper level) a pixel must be to count as ink.
+        Pages with less than blank_ink ink are blank. Pages where more than
+        max_solid of the area is solid dark mass, or with fewer than
+        min_text_lines lines of ink, are images; they are scaled by
+        image_scale, or skipped with skip_images.
+        """
+        self.analysis_height = analysis_height
+        self.ink_contrast = ink_contrast
+        self.blank_ink = blank_ink
+        self.max_solid = max_solid
+        self.min_text_lines = min_text_lines
+        self.max_skew = max_skew
+        self.margin = margin
+        self.image_scale = image_scale
+        self.skip_images = skip_images
+        self.denoise = denoise
+
+    def settings(self):
+        """Constructor arguments, e.g. for worker processes"""
+        return dict(vars(self))
+
+    def _ink(self, small):
+        """Ink and solid-dark masks of the analysis image"""
+        background = cv2.medianBlur(small, 31).astype(np.int16)
+        level = float(np.median(small))
+        ink = (background - small) > max(8, self.ink_contrast * level)
+        # Text strokes vanish under an opening wider than themselves; photos don't
+        dark = ((level - small.astype(np.int16)) > 0.25 * level).astype(np.uint8)
+        solid = cv2.morphologyEx(dark, cv2.MORPH_OPEN, np.ones((9, 9), np.uint8)).astype(bool)
+        return ink, solid
+
+    @staticmethod
+    def _runs(mask):
+        """Number of runs of True in a 1-D mask"""
+        return int(np.count_nonzero(np.diff(mask.astype(np.int8)) == 1) + mask[0]) if mask.size else 0
+
+    def _skew(self, ink):
+        """Skew angle in degrees whose sheared row profile is sharpest"""
+        ys, xs = np.nonzero(ink)
+        if ys.size < 100:
+            return 0.0
+        xs = xs - xs.mean()
+        height = ink.shape[0]
+
+        def sharpness(angle):
+            rows = np.rint(ys - xs * np.tan(np.radians(angle))).astype(np.int64)
+            profile = np.bincount(np.clip(rows, 0, height - 1), minlength=height)
+            return float(np.dot(profile, profile))
+
+        # Coarse then fine search
+        angles = np.arange(-self.max_skew, self.max_skew + 1e-9, 0.5)
+        best = max(angles, key=sharpness)
+        angles = np.arange(best - 0.4, best + 0.41, 0.1)
+        best = float(max(angles, key=sharpness))
+        return round(min(max(best, -self.max_skew), self.max_skew), 2) + 0.0
+
+    def _content_box(self, ink):
+        """Rows and columns with ink, ignoring specks and solid scan borders"""
+        rows = ink.mean(axis=1)
+        cols = ink.mean(axis=0)
+        r = np.flatnonzero((rows > 0.005) & (rows < 0.5))
+        c = np.flatnonzero((cols > 0.005) & (cols < 0.5))
+        if r.size == 0 or c.size == 0:
+            return None
+        return int(c[0]), int(r[0]), int(c[-1]) + 1, int(r[-1]) + 1
+
+    def analyze(self, gray):
+        """Classify a grayscale page and measure its skew and content box
+
+        Returns page_type, skew in degrees and the content box
+        (x0, y0, x1, y1) in full-resolution pixels, or None.
+        """
+        scale = min(1.0, self.analysis_height / gray.shape[0])
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
+        ink, solid = self._ink(small)
+
+        if ink.mean() < self.blank_ink:
+            return 'blank', 0.0, None
+
+        box = self._content_box(ink)
+        if box is None:
+            return 'blank', 0.0, None
+        skew = 0.0
+        if solid.mean() <= self.max_solid:
+            x0, y0, x1, y1 = box
+            skew = self._skew(ink[y0:y1, x0:x1])
+            if skew:
+                # Measure the straightened page
+                center = (small.shape[1] / 2, small.shape[0] / 2)
+                rotation = cv2.getRotationMatrix2D(center, skew, 1.0)
+                ink = cv2.warpAffine(ink.astype(np.uint8), rotation, (small.shape[1], small.shape[0])).astype(bool)
+                box = self._content_box(ink) or box
+
+        # Text lines are the bands of the row profile
+        x0, y0, x1, y1 = box
+        profile = ink[y0:y1, x0:x1].mean(axis=1)
+        lines = self._runs(profile > 0.25 * profile.max())
+        if solid.mean() > self.max_solid or lines < self.min_text_lines:
+            page_type = 'image'
+        else:
+            page_type = 'text'
+
+        # Back to full resolution, with a margin around the content
+        pad = int(self.margin * max(gray.shape))
+        x0, y0, x1, y1 = (int(round(v / scale)) for v in box)
+        box = (max(0, x0 - pad), max(0, y0 - pad),
+               min(gray.shape[1], x1 + pad), min(gray.shape[0], y1 + pad))
+        return page_type, skew, box
+
+    def prepare(self, gray):
+        """Preprocess a grayscale page for tesseract
+
+        Returns (image or None, info). The image is None when the page
+        should not be OCR'd. info has page_type, skew, crop [x, y, w, h] and
+        scale, which map tesseract coordinates back to the original page.
+        """
+        page_type, skew, box = self.analyze(gray)
+        info = {'page_type': page_type, 'skew': skew, 'crop': None, 'scale': 1.0}
+        if page_type == 'blank' or (page_type == 'image' and self.skip_images):
+            return None, info
+
+        image = gray
+        if skew:
+            center = (gray.shape[1] / 2, gray.shape[0] / 2)
+            rotation = cv2.getRotationMatrix2D(center, skew, 1.0)
+            image = cv2.warpAffine(gray, rotation, (gray.shape[1], gray.shape[0]),
+                                   flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+        x0, y0, x1, y1 = box
+        image = image[y0:y1, x0:x1]
+        info['crop'] = [x0, y0, x1 - x0, y1 - y0]
+
+        if page_type == 'image' and self.image_scale < 1:
+            image = cv2.resize(image, None, fx=self.image_scale, fy=self.image_scale,
+                               interpolation=cv2.INTER_AREA)
+            info['scale'] = self.image_scale
+        if self.denoise:
+            image = cv2.medianBlur(image, 3)
+        return image, info
+
+class OCRCache:
+    """On-disk raw OCR of PDF pages keyed by hash(PDF bytes, page, dpi, OCR settings)
+
+    Entries are tagged with the PDF's hash, so one book can be invalidated
+    without touching the others; the store evicts least recently used
+    pages beyond max_bytes.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path=OCR_CACHE_PATH, max_bytes=1024 * 1024 * 1024):
+        self.path = path
+        self.store = DiskCache(path, max_bytes=max_bytes)
+
+    @staticmethod
+    def file_digest(path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def key(self, pdf_digest, page_number, dpi, settings):
+        return cache_key('ocr', self.VERSION, pdf_digest, page_number, dpi,
+                         sorted(settings.items()))
+
+    def has(self, pdf_digest, page_number, dpi, settings):
+        return self.key(pdf_digest, page_number, dpi, settings) in self.store
+
+    def get(self, pdf_digest, page_number, dpi, settings):
+        return self.store.get(self.key(pdf_digest, page_number, dpi, settings))
+
+    def put(self, pdf_digest, page_number, dpi, settings, raw):
+        self.store.put(self.key(pdf_digest, page_number, dpi, settings), raw, tag=pdf_digest)
+
+    def invalidate(self, pdf_path):
+        """Drop every cached page of a PDF, whatever settings it was read with"""
+        return self.store.clear(tag=self.file_digest(pdf_path))
+
+    def clear(self):
+        return self.store.clear()
+
+    def stats(self):
+        return self.store.stats()
+
+    def close(self):
+        self.store.close()
+
+# Per-process OCR instance used by the page worker pool
+_worker_ocr = None
+
+def _init_page_worker(settings):
+    """Create the OCR instance held by each pool process"""
+    global _worker_ocr
+    _worker_ocr = AdvancedOCR(**settings)
+    # Pool processes don't run atexit handlers; this closes the OCR cache on exit
+    Finalize(_worker_ocr, _worker_ocr.close, exitpriority=10)
+
+def _ocr_pdf_page(pdf_path, page_number, lang):
+    """Rasterize and OCR a single PDF page inside a pool process
+
+    The worker's spelling cache statistics are returned alongside the page
+    so the parent can report them for the whole book.
+    """
+    result = _worker_ocr.process_pdf_page(pdf_path, page_number, lang)
+    return result, os.getpid(), _worker_ocr.text_corrector.cache_stats()
+
 class AdvancedOCR:
-    def __init__(self, tesseract_path=None, dpi=300):
-        """Initialize OCR with text correction"""
+    TESSERACT_CONFIG = r'--oem 3 --psm 6'
+
+    def __init__(self, tesseract_path=None, dpi=300, workers=1, page_window=4,
+                 single_pass=True, spelling_cache_size=50000, max_edit2_length=None,
+                 preprocess=False, adaptive_dpi=None, min_confidence=80, ocr_cache=False,
+                 word_boxes=False):
+        """Initialize OCR with text correction
+
+        workers is the number of processes used for PDF pages
+        (None means one per CPU core, 1 keeps everything in-process).
+        page_window is how many pages are rasterized at once, which bounds
+        the memory held by decoded page images.
+        single_pass runs tesseract once per image and rebuilds the text
+        from image_to_data instead of also calling image_to_string.
+        word_boxes adds every word's text, confidence and bounding box to
+        the results as 'words'.
+        spelling_cache_size and max_edit2_length are passed to TextCorrector.
+        preprocess (True, or a dict of settings) deskews, crops and
+        classifies pages with PagePreprocessor before tesseract.
+        adaptive_dpi (e.g. 200) rasterizes PDF pages at that lower DPI
+        first, and again at dpi only when their mean word confidence is
+        below min_confidence.
+        ocr_cache keeps the raw tesseract output of PDF pages in an OCRCache
+        (True for the default location, a path, or an OCRCache), so runs
+        that only change text correction don't OCR the book again. Call
+        close(), or use the instance as a context manager, to close it.
+        """
         if tesseract_path:
             pytesseract.pytesseract.tesseract_cmd = tesseract_path
         else:
             # Set default Tesseract path for Mac
             pytesseract.pytesseract.tesseract_cmd = '/opt/homebrew/bin/tesseract'
+        self.tesseract_path = pytesseract.pytesseract.tesseract_cmd
         self.dpi = dpi
-        self.text_corrector = TextCorrector()
+        self.adaptive_dpi = adaptive_dpi if adaptive_dpi and adaptive_dpi < dpi else None
+        self.min_confidence = min_confidence
+        self.workers = workers or os.cpu_count() or 1
+        self.page_window = max(1, page_window)
+        self.single_pass = single_pass
+        self.word_boxes = word_boxes
+        self.text_corrector = TextCorrector(spelling_cache_size, max_edit2_length)
+        if preprocess:
+            self.preprocessor = PagePreprocessor(**(preprocess if isinstance(preprocess, dict) else {}))
+        else:
+            self.preprocessor = None
+        self._worker_cache_stats = {}
+        if ocr_cache is True:
+            ocr_cache = OCRCache()
+        elif isinstance(ocr_cache, str):
+            ocr_cache = OCRCache(ocr_cache)
+        self.ocr_cache = ocr_cache or None
+        self._pdf_digests = {}
+        self._tesseract_version = None
 
-    def process_image(self, image, lang='eng'):
-        """Process image with text correction"""
+    def close(self):
+        """Close the OCR cache"""
+        if self.ocr_cache:
+            self.ocr_cache.close()
+            self.ocr_cache = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _worker_settings(self):
+        """Constructor arguments for the per-process OCR instances"""
+        return {
+            'tesseract_path': self.tesseract_path,
+            'dpi': self.dpi,
+            'adaptive_dpi': self.adaptive_dpi,
+            'min_confidence': self.min_confidence,
+            'workers': 1,
+            'page_window': self.page_window,
+            'single_pass': self.single_pass,
+            'word_boxes': self.word_boxes,
+            'spelling_cache_size': self.text_corrector.cache_size,
+            'max_edit2_length': self.text_corrector.max_edit2_length,
+            'preprocess': self.preprocessor.settings() if self.preprocessor else False,
+            'ocr_cache': self.ocr_cache.path if self.ocr_cache else False
+        }
+
+    def _ocr_settings(self, lang):
+        """Everything besides the page image that changes the raw OCR output"""
+        if self._tesseract_version is None:
+            try:
+                self._tesseract_version = str(pytesseract.get_tesseract_version())
+            except Exception:
+                self._tesseract_version = 'unknown'
+        return {
+            'lang': lang,
+            'config': self.TESSERACT_CONFIG,
+            'single_pass': self.single_pass,
+            'word_boxes': self.word_boxes,
+            'preprocess': self.preprocessor.settings() if self.preprocessor else False,
+            'tesseract': self._tesseract_version
+        }
+
+    def _pdf_digest(self, pdf_path):
+        """Hash of the PDF's bytes, computed once per file version"""
+        stat = os.stat(pdf_path)
+        version = (os.path.abspath(pdf_path), stat.st_size, stat.st_mtime_ns)
+        if version not in self._pdf_digests:
+            self._pdf_digests[version] = OCRCache.file_digest(pdf_path)
+        return self._pdf_digests[version]
+
+    @staticmethod
+    def _text_from_data(data):
+        """Rebuild page text from image_to_data output
+
+        Words are joined by spaces, lines by newlines, and paragraphs and
+        blocks are separated by a blank line, as image_to_string does.
+        """
+        paragraphs = []
+        current_paragraph = None
+        current_line = None
+
+        for i, level in enumerate(data['level']):
+            word = data['text'][i].strip()
+            if level != 5 or not word:
+                continue
+
+            paragraph_key = (data['page_num'][i], data['block_num'][i], data['par_num'][i])
+            line_key = paragraph_key + (data['line_num'][i],)
+
+            if paragraph_key != current_paragraph:
+                paragraphs.append([])
+                current_paragraph = paragraph_key
+                current_line = None
+            if line_key != current_line:
+                paragraphs[-1].append([])
+                current_line = line_key
+            paragraphs[-1][-1].append(word)
+
+        return '\n\n'.join(
+            '\n'.join(' '.join(line) for line in paragraph)
+            for paragraph in paragraphs
+        )
+
+    @staticmethod
+    def _words_from_data(data):
+        """Word-level confidences and bounding boxes from image_to_data output"""
+        words = []
+        for i, level in enumerate(data['level']):
+            word = data['text'][i].strip()
+            if level != 5 or not word:
+                continue
+            words.append({
+                'text': word,
+                'confidence': data['conf'][i],
+                'bbox': [data['left'][i], data['top'][i], data['width'][i], data['height'][i]],
+                'block': data['block_num'][i],
+                'paragraph': data['par_num'][i],
+                'line': data['line_num'][i]
+            })
+        return words
+
+    @staticmethod
+    def _to_page_coordinates(words, info):
+        """Map word boxes of a preprocessed image back to the (straightened) page"""
+        x, y = info['crop'][:2]
+        scale = info['scale']
+        for word in words:
+            left, top, width, height = word['bbox']
+            word['bbox'] = [round(left / scale) + x, round(top / scale) + y,
+                            round(width / scale), round(height / scale)]
+        return words
+
+    def recognize(self, image, lang='eng'):
+        """Raw tesseract output of an image, before any text correction
+
+        Returns raw_text, confidence, the preprocessing details and, with
+        word_boxes, the words.
+        """
         # Convert to grayscale
         if len(image.shape) == 3:
             gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         else:
             gray = image
 
+        # Deskew, crop to the text and skip pages without any
+        info = None
+        if self.preprocessor:
+            gray, info = self.preprocessor.prepare(gray)
+            if gray is None:
+                raw = {'raw_text': '', 'confidence': 0, 'preprocessing': info}
+                if self.word_boxes:
+                    raw['words'] = []
+                return raw
+
         # Apply thresholding
         thresh = cv2.adaptiveThreshold(
             gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
             cv2.THRESH_BINARY, 11, 2
         )
 
-        # Extract text
-        custom_config = r'--oem 3 --psm 6'
-        raw_text = pytesseract.image_to_string(
-            thresh, lang=lang, config=custom_config
+        # Extract words with their confidences and positions
+        data = pytesseract.image_to_data(
+            thresh, lang=lang, config=self.TESSERACT_CONFIG,
+            output_type=pytesseract.Output.DICT
         )
 
-        # Correct text
-        corrected_text = self.text_corrector.process_text(raw_text)
+        # Extract text
+        if self.single_pass:
+            raw_text = self._text_from_data(data)
+        else:
+            raw_text = pytesseract.image_to_string(
+                thresh, lang=lang, config=self.TESSERACT_CONFIG
+            )
 
         # Get confidence
-        data = pytesseract.image_to_data(
-            thresh, lang=lang, config=custom_config,
-            output_type=pytesseract.Output.DICT
-        )
         confidences = [conf for conf in data['conf'] if conf != -1]
         avg_confidence = sum(confidences) / len(confidences) if confidences else 0
 
-        return {
-            'raw_text': raw_text.strip(),
+        raw = {'raw_text': raw_text.strip(), 'confidence': round(avg_confidence, 2)}
+        if info:
+            raw['preprocessing'] = info
+        if self.word_boxes:
+            words = self._words_from_data(data)
+            raw['words'] = self._to_page_coordinates(words, info) if info else words
+        return raw
+
+    def correct(self, raw, lang='eng'):
+        """Page result from raw OCR output, with text correction"""
+        info = raw.get('preprocessing')
+        if info and info['crop'] is None:
+            # Nothing was OCR'd
+            corrected_text = ''
+        else:
+            corrected_text = self.text_corrector.process_text(raw['raw_text'])
+
+        result = {
+            'raw_text': raw['raw_text'],
             'corrected_text': corrected_text,
-            'confidence': round(avg_confidence, 2),
+            'confidence': raw['confidence'],
             'language': lang
         }
+        if info:
+            result['page_type'] = info['page_type']
+            result['preprocessing'] = info
+        if 'words' in raw:
+            result['words'] = raw['words']
+        return result
+
+    def process_image(self, image, lang='eng'):
+        """Process image with text correction"""
+        return self.correct(self.recognize(image, lang), lang)
+
+    def _recognize_pdf_page(self, pdf_path, page_number, lang, dpi, image=None):
+        """Raw OCR of a PDF page at dpi and whether it came from the cache
+
+        The cache is checked before the page is rasterized; image, when
+        given, is the page already rasterized at dpi.
+        """
+        if self.ocr_cache:
+            digest = self._pdf_digest(pdf_path)
+            settings = self._ocr_settings(lang)
+            raw = self.ocr_cache.get(digest, page_number, dpi, settings)
+            if raw is not None:
+                return raw, True
+        if image is None:
+            image = self._rasterize_pages(pdf_path, page_number, page_number, dpi)[0]
+        raw = self.recognize(image, lang)
+        if self.ocr_cache:
+            self.ocr_cache.put(digest, page_number, dpi, settings, raw)
+        return raw, False
+
+    def _rasterize_pages(self, pdf_path, first_page, last_page, dpi=None):
+        """Rasterize a page range into OpenCV images, at the first-pass DPI by default"""
+        images = pdf2image.convert_from_path(
+            pdf_path, dpi=dpi or self.adaptive_dpi or self.dpi,
+            first_page=first_page, last_page=last_page
+        )
+        if len(images) != last_page - first_page + 1:
+            raise ValueError(f"Pages {first_page}-{last_page} could not be rasterized")
+
+        # Convert PIL Images to OpenCV format
+        return [cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR) for image in images]
+
+    def iter_pdf_pages(self, pdf_path, first_page=1, last_page=None):
+        """Yield (page_number, image) pairs, rasterizing page_window pages at a time
+
+        A page that cannot be rasterized is yielded with the exception in
+        place of its image.
+        """
+        if last_page is None:
+            last_page = pdf2image.pdfinfo_from_path(pdf_path)['Pages']
+
+        for start in range(first_page, last_page + 1, self.page_window):
+            end = min(start + self.page_window - 1, last_page)
+            try:
+                window = deque(self._rasterize_pages(pdf_path, start, end))
+            except Exception:
+                # Retry page by page so one bad page does not sink its window
+                window = None
+
+            for page_number in range(start, end + 1):
+                if window is not None:
+                    # Pop so each image is released as soon as it is consumed
+                    yield page_number, window.popleft()
+                    continue
+                try:
+                    image = self._rasterize_pages(pdf_path, page_number, page_number)[0]
+                except Exception as e:
+                    image = e
+                yield page_number, image
+
+    def _needs_retry(self, result):
+        """Whether a first-pass page is worth OCR'ing again at full DPI"""
+        info = result.get('preprocessing')
+        if info and info['crop'] is None:
+            # Skipped blank page
+            return False
+        return result['confidence'] < self.min_confidence
+
+    def _process_page_image(self, image, page_number, lang, pdf_path=None):
+        """Process one rasterized page, keeping failures local to that page
+
+        With pdf_path, the page's raw OCR comes from the cache when it is
+        there, and image may be None to rasterize the page only if needed.
+        In adaptive mode a page whose confidence is too low is read again at
+        full DPI; the better of the two results is kept, and a failed retry
+        leaves the first result in place. Every pass is recorded in
+        result['ocr_passes'].
+        """
+        dpi = self.adaptive_dpi or self.dpi
+        cached = False
+        try:
+            if isinstance(image, Exception):
+                raise image
+            started = time.perf_counter()
+            if pdf_path:
+                raw, cached = self._recognize_pdf_page(pdf_path, page_number, lang, dpi, image)
+            else:
+                raw = self.recognize(image, lang)
+            passes = [{'dpi': dpi, 'confidence': raw['confidence'], 'cached': cached,
+                       'seconds': round(time.perf_counter() - started, 3)}]
+
+            if self.adaptive_dpi and pdf_path and self._needs_retry(raw):
+                started = time.perf_counter()
+                try:
+                    retry, retry_cached = self._recognize_pdf_page(pdf_path, page_number, lang, self.dpi)
+                except Exception as e:
+                    passes.append({'dpi': self.dpi, 'error': str(e), 'cached': False,
+                                   'seconds': round(time.perf_counter() - started, 3)})
+                else:
+                    passes.append({'dpi': self.dpi, 'confidence': retry['confidence'], 'cached': retry_cached,
+                                   'seconds': round(time.perf_counter() - started, 3)})
+                    if retry['confidence'] >= raw['confidence']:
+                        raw, dpi = retry, self.dpi
+                cached = all(p['cached'] for p in passes)
+            result = self.correct(raw, lang)
+            if self.adaptive_dpi:
+                result['ocr_passes'] = passes
+        except Exception as e:
+            result = {'error': str(e)}
+
+        result['page'] = page_number
+        result['dpi'] = dpi
+        if self.ocr_cache:
+            result['ocr_cached'] = cached
+        return result
+
+    def process_pdf_page(self, pdf_path, page_number, lang='eng'):
+        """Rasterize and process a single PDF page, unless its raw OCR is cached"""
+        return self._process_page_image(None, page_number, lang, pdf_path)
+
+    def _iter_uncached_pages(self, pdf_path, first_page, last_page, lang):
+        """Like iter_pdf_pages, but yield None for pages whose raw OCR is cached
+
+        Runs of uncached pages are still rasterized page_window at a time.
+        """
+        dpi = self.adaptive_dpi or self.dpi
+        digest = self._pdf_digest(pdf_path)
+        settings = self._ocr_settings(lang)
+
+        def is_cached(page_number):
+            return self.ocr_cache.has(digest, page_number, dpi, settings)
+
+        for cached, run in groupby(range(first_page, last_page + 1), key=is_cached):
+            run = list(run)
+            if cached:
+                for page_number in run:
+                    yield page_number, None
+            else:
+                yield from self.iter_pdf_pages(pdf_path, run[0], run[-1])
+
+    def iter_process_pdf(self, pdf_path, lang='eng', total_pages=None):
+        """Yield page results in page order as soon as each page is done
+
+        Pages are rasterized lazily, so the first page's text is available
+        before the rest of the PDF has been decoded.
+        """
+        if total_pages is None:
+            total_pages = pdf2image.pdfinfo_from_path(pdf_path)['Pages']
+
+        if self.workers > 1 and total_pages > 1:
+            yield from self._iter_pages_parallel(pdf_path, range(1, total_pages + 1), lang)
+        else:
+            if self.ocr_cache:
+                pages = self._iter_uncached_pages(pdf_path, 1, total_pages, lang)
+            else:
+                pages = self.iter_pdf_pages(pdf_path, 1, total_pages)
+            for page_number, image in pages:
+                yield self._process_page_image(image, page_number, lang, pdf_path)
 
     def process_pdf(self, pdf_path, lang='eng'):
         """Process PDF with text correction"""
-        results = {'pages': []}
-        
         try:
-            images = pdf2image.convert_from_path(pdf_path, dpi=self.dpi)
-            
-            for i, image in enumerate(images, 1):
-                # Convert PIL Image to OpenCV format
-                opencv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-                
-                # Process the image
-                result = self.process_image(opencv_image, lang)
-                result['page'] = i
-                results['pages'].append(result)
-
-            results['total_pages'] = len(images)
-            return results
-
+            total_pages = pdf2image.pdfinfo_from_path(pdf_path)['Pages']
         except Exception as e:
             return {'error': str(e), 'pages': []}
 
+        hits = self.text_corrector.cache_hits
+        misses = self.text_corrector.cache_misses
+        self._worker_cache_stats = {}
+
+        pages = list(self.iter_process_pdf(pdf_path, lang, total_pages))
+
+        # Spelling cache usage for this book, in-process and across workers
+        hits = self.text_corrector.cache_hits - hits
+        misses = self.text_corrector.cache_misses - misses
+        for stats in self._worker_cache_stats.values():
+            hits += stats['hits']
+            misses += stats['misses']
+
+        result = {
+            'pages': pages,
+            'total_pages': total_pages,
+            'failed_pages': [page['page'] for page in pages if 'error' in page],
+            'spelling_cache': {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0.0
+            }
+        }
+        if self.adaptive_dpi:
+            result['adaptive_dpi'] = self._dpi_summary(pages)
+        if self.ocr_cache:
+            cached = sum(1 for page in pages if page.get('ocr_cached'))
+            result['ocr_cache'] = {'cached_pages': cached, 'ocr_pages': len(pages) - cached}
+        return result
+
+    def _dpi_summary(self, pages):
+        """DPI decisions for a book and the OCR time they saved
+
+        OCR time grows with the pixel count, so a page kept at the lower DPI
+        is estimated to have cost (dpi / adaptive_dpi)^2 times as much at
+        full DPI. A retried page cost its first pass on top of the full one.
+        Passes read from the OCR cache took no OCR time, so pages with one
+        are left out of the estimate.
+        """
+        factor = (self.dpi / self.adaptive_dpi) ** 2
+        low_pages = []
+        retried_pages = []
+        seconds = 0.0
+        saved = 0.0
+        for page in pages:
+            passes = page.get('ocr_passes')
+            if not passes:
+                continue
+            if len(passes) == 1:
+                low_pages.append(page['page'])
+            else:
+                retried_pages.append(page['page'])
+            seconds += sum(p['seconds'] for p in passes if not p['cached'])
+            if any(p['cached'] for p in passes):
+                continue
+            spent = sum(p['seconds'] for p in passes)
+            if len(passes) > 1 and 'error' not in passes[1]:
+                full = passes[1]['seconds']
+            else:
+                full = passes[0]['seconds'] * factor
+            saved += full - spent
+        return {
+            'low_dpi': self.adaptive_dpi,
+            'high_dpi': self.dpi,
+            'min_confidence': self.min_confidence,
+            'low_dpi_pages': low_pages,
+            'retried_pages': retried_pages,
+            'ocr_seconds': round(seconds, 2),
+            'estimated_seconds_saved': round(saved, 2)
+        }
+
+    def _iter_pages_parallel(self, pdf_path, page_numbers, lang):
+        """OCR pages on a process pool, yielding results in page order
+
+        At most two pages per worker are in flight, so memory stays bounded
+        and results stream out while later pages are still queued.
+        """
+        workers = min(self.workers, len(page_numbers))
+        max_in_flight = workers * 2
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_page_worker,
+            initargs=(self._worker_settings(),)
+        ) as executor:
+            in_flight = deque()
+            for page_number in page_numbers:
+                in_flight.append(
+                    (page_number, executor.submit(_ocr_pdf_page, pdf_path, page_number, lang))
+                )
+                if len(in_flight) >= max_in_flight:
+                    yield self._collect_page(*in_flight.popleft())
+
+            while in_flight:
+                yield self._collect_page(*in_flight.popleft())
+
+    def _collect_page(self, page_number, future):
+        """Wait for a pooled page, turning a worker crash into a page error"""
+        try:
+            result, pid, cache_stats = future.result()
+        except Exception as e:
+            return {'error': str(e), 'page': page_number}
+
+        self._worker_cache_stats[pid] = cache_stats
+        return result
+
     def process_file(self, file_path, output_path=None, lang='eng'):
         """Process file and save results"""
         try:
@@ -205,7 +949,7 @@ class AdvancedOCR:
                     elif 'pages' in result:
                         for page in result['pages']:
                             f.write(f"--- Page {page['page']} ---\n")
-                            f.write(page['corrected_text'])
+                            f.write(page.get('corrected_text', f"[OCR failed: {page.get('error')}]"))
                             f.write('\n\n')
 
             return result
@@ -219,21 +963,42 @@ class AdvancedOCR:
 
 # Example usage
 if __name__ == "__main__":
-    # Initialize OCR tool
-    ocr = AdvancedOCR()
+    # Initialize OCR tool (one worker process per CPU core); pages are
+    # deskewed and cropped, OCR'd at 200 DPI and only the unclear ones again at 300
+    # OCR output is cached, so running this again only redoes text correction
+    with AdvancedOCR(workers=None, adaptive_dpi=200, preprocess=True,
+                     ocr_cache=True) as ocr:
     
-    # Process a file with text correction
-    result = ocr.process_file(
-        '/Users/mac-Z22HBENM/Desktop/Learning/History/Timeline/ai_scripts/examples/moroccothatwas00harrrich-1-31.pdf',
-        output_path='/Users/mac-Z22HBENM/Desktop/Learning/History/Timeline/ai_scripts/examples/corrected_moroccothatwas00harrrich-1-31.json'
-    )
+        # Process a file with text correction
+        result = ocr.process_file(
+            '/Users/mac-Z22HBENM/Desktop/Learning/History/Timeline/ai_scripts/examples/moroccothatwas00harrrich-1-31.pdf',
+            output_path='/Users/mac-Z22HBENM/Desktop/Learning/History/Timeline/ai_scripts/examples/corrected_moroccothatwas00harrrich-1-31.json'
+        )
     
     if 'error' not in result:
         if 'pages' in result:
             print(f"Processed {result['total_pages']} pages")
+            cache = result['spelling_cache']
+            print(f"Spelling cache hit rate: {cache['hit_rate']:.1%} "
+                  f"({cache['hits']} hits, {cache['misses']} misses)")
+            if result['failed_pages']:
+                print(f"Failed pages: {result['failed_pages']}")
+            if 'adaptive_dpi' in result:
+                dpi = result['adaptive_dpi']
+                print(f"{len(dpi['low_dpi_pages'])} pages at {dpi['low_dpi']} DPI, "
+                      f"{len(dpi['retried_pages'])} retried at {dpi['high_dpi']} DPI, "
+                      f"about {dpi['estimated_seconds_saved']:.0f}s saved")
+            if 'ocr_cache' in result:
+                print(f"Raw OCR reused from cache for {result['ocr_cache']['cached_pages']} pages")
             for page in result['pages']:
                 print(f"\nPage {page['page']}:")
-                print(f"Confidence: {page['confidence']}%")
+                if 'error' in page:
+                    print(f"Error: {page['error']}")
+                    continue
+                if 'preprocessing' in page and page['preprocessing']['crop'] is None:
+                    print(f"Skipped {page['page_type']} page")
+                    continue
+                print(f"Confidence: {page['confidence']}% at {page['dpi']} DPI")
                 print("Corrected text sample:")
                 print(page['corrected_text'][:200] + "...")
         else:
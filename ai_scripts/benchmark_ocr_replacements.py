@@ -0,0 +1,38 @@
+import os
+import sys
+import timeit
+
+from ocr_issues_cleaner import OCRCleaner
+
+DEFAULT_SAMPLE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    'examples', 'morocco-that-was_Walter-Harris.txt'
+)
+
+def benchmark(name, single_pass, sequential, text, repeat):
+    """Time both implementations on text and check they agree"""
+    if single_pass(text) != sequential(text):
+        raise AssertionError(f"{name}: single-pass output differs from the sequential rules")
+
+    sequential_time = min(timeit.repeat(lambda: sequential(text), number=1, repeat=repeat))
+    single_pass_time = min(timeit.repeat(lambda: single_pass(text), number=1, repeat=repeat))
+
+    print(f"{name}:")
+    print(f"  sequential:  {sequential_time * 1000:8.1f} ms")
+    print(f"  single pass: {single_pass_time * 1000:8.1f} ms")
+    print(f"  speedup:     {sequential_time / single_pass_time:8.1f}x")
+
+def main(sample_path=DEFAULT_SAMPLE, repeat=5):
+    with open(sample_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    print(f"Sample: {sample_path} ({len(text)} characters)\n")
+
+    benchmark(
+        'OCRCleaner.fix_common_ocr_errors',
+        OCRCleaner.fix_common_ocr_errors,
+        OCRCleaner._fix_common_ocr_errors_sequential,
+        text, repeat
+    )
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
@@ -0,0 +1,291 @@
+import hashlib
+import json
+import os
+import re
+from bisect import bisect_left
+from dataclasses import asdict, dataclass
+from typing import Iterator, List, Optional, Pattern, Sequence
+
+# Heading heuristics used by translate_local_book - multiple approaches combined
+TITLE_PATTERN = re.compile(
+    r'(?mx)'                     # m: multiline, x: verbose mode
+    r'(?:'                       # Start of non-capturing group for different title formats
+    r'^\s*[A-Z][A-Z\s]+[A-Z]\s*$'  # All caps title on its own line
+    r'|'                         # OR
+    r'^\s*[A-Z][a-zA-Z\s]+\s*\d+\s*$'  # Title followed by page number
+    r'|'                         # OR
+    r'^\s*[A-Z][a-zA-Z\s,]+\n'  # Title starting with capital, followed by newline
+    r')'
+)
+
+_NON_SPACE = re.compile(r'\S')
+
+@dataclass(frozen=True)
+class ChapterSpan:
+    title: str          # stripped heading, '' for the text before the first heading
+    start: int          # offset where the chapter body starts, right after the heading
+    end: int            # offset of the next heading, or the end of the text
+    heading_start: int  # offset where the heading itself starts
+
+    def text(self, source: str) -> str:
+        return source[self.start:self.end]
+
+    def is_blank(self, source: str) -> bool:
+        return _NON_SPACE.search(source, self.start, self.end) is None
+
+def iter_chapter_spans(text: str, pattern: Pattern = TITLE_PATTERN) -> Iterator[ChapterSpan]:
+    """
+    Chapter spans of text in one finditer pass over it.
+
+    The first span is always the text before the first heading (title '').
+    Every heading match opens a span that runs to the next match.
+    """
+    title, heading_start, body_start = '', 0, 0
+    for match in pattern.finditer(text):
+        yield ChapterSpan(title, body_start, match.start(), heading_start)
+        title, heading_start, body_start = match.group().strip(), match.start(), match.end()
+    yield ChapterSpan(title, body_start, len(text), heading_start)
+
+def segment_chapters(text: str, pattern: Pattern = TITLE_PATTERN) -> List[ChapterSpan]:
+    """Chapter spans of text, with the untitled preface first only if it holds any text"""
+    spans = list(iter_chapter_spans(text, pattern))
+    if spans[0].is_blank(text):
+        spans = spans[1:]
+    return spans
+
+_WORD = re.compile(r'\w+')
+# "I.", "HI.", "12." in front of an OCR'd TOC title
+_SECTION_NUMBER = re.compile(r'\w{1,4}\.\s')
+
+# A roman or arabic chapter number, including OCR misreadings like "n." and "HI." for "II."
+_CHAPTER_NUMBER = re.compile(r'[IVXLCHn\d]{1,4}\.\s+')
+# Punctuation and stray single letters at the end of a title
+_TRAILING_NOISE = re.compile(r'(?:\W|\b\w\b)+$')
+
+# A heading line: optional section number, the title, nothing but punctuation after
+_HEADING_LINE = r'^[^\S\n]*(?:[IVXLC\d]+\.?[^\S\n]+)?(?:{titles})[^\w\n]*$'
+
+def _title_pattern(title: str) -> Optional[str]:
+    """
+    Regex for the words of a TOC title, separated by any punctuation or
+    whitespace. None if nothing is left to match.
+    """
+    words = _WORD.findall(title)
+    if _SECTION_NUMBER.match(title):
+        words = words[1:]
+    # OCR noise after the title, like the 'V' of "THE SULTAN IN FRANCE V"
+    while words and len(words[-1]) == 1:
+        words.pop()
+    if not any(word.isalpha() for word in words):
+        return None
+    return r'\W+'.join(map(re.escape, words))
+
+def clean_title(title: str) -> str:
+    """
+    title without its chapter number and trailing OCR noise:
+    "VH. THE SULTAN IN FRANCE V" becomes "THE SULTAN IN FRANCE"
+    """
+    title = title.strip()
+    number = _CHAPTER_NUMBER.match(title)
+    if number:
+        title = title[number.end():]
+    return _TRAILING_NOISE.sub('', title) or title
+
+def chapter_entries(entries: Sequence) -> List:
+    """The leading TOC entries in page order; a drop in page starts another list (e.g. illustrations)"""
+    chapters = []
+    for entry in entries:
+        if chapters and entry.page < chapters[-1].page:
+            break
+        chapters.append(entry)
+    return chapters
+
+def resolve_toc(text: str, entries: Sequence, start: int = 0) -> List[ChapterSpan]:
+    """
+    Locate TOC entries (toc_extractor.TOCEntry) as headings in text.
+
+    All titles go into one alternation searched in a single pass from start;
+    of all the matches, the longest run that is in TOC order is kept, so a
+    stray match can't hide the chapters after it. Lines ending in a page
+    number (TOC lines, running headers) never match. Entries whose heading
+    isn't found are left out. Returns one span per found chapter, running to
+    the next one.
+    """
+    alternatives = []
+    for i, entry in enumerate(entries):
+        pattern = _title_pattern(entry.title)
+        if pattern:
+            alternatives.append(f"(?P<e{i}>{pattern})")
+    if not alternatives:
+        return []
+
+    headings = re.compile(_HEADING_LINE.format(titles='|'.join(alternatives)),
+                          re.MULTILINE | re.IGNORECASE)
+    matches = [(int(match.lastgroup[1:]), match.start(), match.end())
+               for match in headings.finditer(text, start)]
+
+    # Longest increasing subsequence of entry indices (patience sorting)
+    tails, tail_matches, previous = [], [], []
+    for n, (i, _, _) in enumerate(matches):
+        k = bisect_left(tails, i)
+        previous.append(tail_matches[k - 1] if k else -1)
+        if k == len(tails):
+            tails.append(i)
+            tail_matches.append(n)
+        else:
+            tails[k] = i
+            tail_matches[k] = n
+    found = []
+    n = tail_matches[-1] if tail_matches else -1
+    while n >= 0:
+        i, heading_start, body_start = matches[n]
+        found.append((entries[i].title, heading_start, body_start))
+        n = previous[n]
+    found.reverse()
+
+    return [
+        ChapterSpan(title, body_start, found[k + 1][1] if k + 1 < len(found) else len(text), heading_start)
+        for k, (title, heading_start, body_start) in enumerate(found)
+    ]
+
+@dataclass(frozen=True)
+class IndexedChapter:
+    title: str
+    page: int           # page number from the TOC, -1 if not from a TOC
+    heading_start: int  # byte offsets into the source file
+    start: int
+    end: int
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ChapterIndex:
+    """
+    Persistent chapter index of a book: byte offsets of every chapter heading
+    and body, saved as <book>.chapters.json.
+
+    Built once from the TOC (falling back to TITLE_PATTERN headings when there
+    is no usable TOC), after which any stage can read one chapter with a seek,
+    or slice an mmap of the file, instead of segmenting the book again. The
+    index records the file's size, mtime and hash and is rebuilt when they
+    no longer match.
+    """
+
+    VERSION = 2
+
+    def __init__(self, source_path: str, chapters: List[IndexedChapter], encoding: str = 'utf-8',
+                 source: Optional[dict] = None):
+        self.source_path = source_path
+        self.chapters = chapters
+        self.encoding = encoding
+        self.source = source or self._describe_source(source_path)
+
+    @staticmethod
+    def _describe_source(path: str, digest: Optional[str] = None) -> dict:
+        stat = os.stat(path)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                'sha256': digest or _file_digest(path)}
+
+    @staticmethod
+    def default_path(source_path: str) -> str:
+        return f"{source_path}.chapters.json"
+
+    @classmethod
+    def build(cls, source_path: str, entries: Optional[Sequence] = None,
+              encoding: str = 'utf-8') -> 'ChapterIndex':
+        """
+        Index a book file. entries are TOC entries; by default they are read
+        with toc_extractor.TOCExtractor.
+        """
+        # newline='' keeps \r\n intact so character and byte offsets line up
+        with open(source_path, 'r', encoding=encoding, newline='') as f:
+            text = f.read()
+
+        if entries is None:
+            from toc_extractor import TOCExtractor
+            entries = TOCExtractor().extract_toc(text)
+        entries = chapter_entries(entries)
+        spans = resolve_toc(text, entries)
+        pages = {clean_title(entry.title): entry.page for entry in entries}
+        if not spans:
+            spans = segment_chapters(text)
+            pages = {}
+
+        # Character offsets to byte offsets, encoding each stretch once
+        offsets = sorted({offset for span in spans for offset in (span.heading_start, span.start, span.end)})
+        byte_offsets = {}
+        position = byte_position = 0
+        for offset in offsets:
+            byte_position += len(text[position:offset].encode(encoding))
+            byte_offsets[offset] = byte_position
+            position = offset
+
+        chapters = []
+        for span in spans:
+            title = clean_title(span.title)
+            chapters.append(IndexedChapter(title, pages.get(title, -1), byte_offsets[span.heading_start],
+                                           byte_offsets[span.start], byte_offsets[span.end]))
+        return cls(source_path, chapters, encoding)
+
+    def save(self, path: Optional[str] = None) -> str:
+        path = path or self.default_path(self.source_path)
+        data = {
+            'version': self.VERSION,
+            'source': self.source,
+            'encoding': self.encoding,
+            'chapters': [asdict(chapter) for chapter in self.chapters]
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, source_path: str, path: Optional[str] = None) -> Optional['ChapterIndex']:
+        """The saved index of source_path, or None if it is missing or stale"""
+        path = path or cls.default_path(source_path)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            stat = os.stat(source_path)
+        except (OSError, ValueError):
+            return None
+        source = data.get('source', {})
+        if data.get('version') != cls.VERSION or source.get('size') != stat.st_size:
+            return None
+        if source.get('mtime_ns') != stat.st_mtime_ns:
+            # Touched but maybe unchanged: compare contents
+            digest = _file_digest(source_path)
+            if source.get('sha256') != digest:
+                return None
+            source = cls._describe_source(source_path, digest)
+        chapters = [IndexedChapter(**chapter) for chapter in data['chapters']]
+        return cls(source_path, chapters, data.get('encoding', 'utf-8'), source)
+
+    @classmethod
+    def load_or_build(cls, source_path: str, entries: Optional[Sequence] = None,
+                      encoding: str = 'utf-8') -> 'ChapterIndex':
+        index = cls.load(source_path)
+        if index is None:
+            index = cls.build(source_path, entries, encoding)
+            index.save()
+        return index
+
+    def __len__(self) -> int:
+        return len(self.chapters)
+
+    def __iter__(self) -> Iterator[IndexedChapter]:
+        return iter(self.chapters)
+
+    def read(self, i: int, heading: bool = False) -> str:
+        """Text of chapter i, read with a single seek; heading includes its heading line"""
+        chapter = self.chapters[i]
+        start = chapter.heading_start if heading else chapter.start
+        with open(self.source_path, 'rb') as f:
+            f.seek(start)
+            return f.read(chapter.end - start).decode(self.encoding)
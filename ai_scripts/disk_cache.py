@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_DIR = os.environ.get(
+    'AI_SCRIPTS_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'ai_scripts')
+)
+
+def cache_key(*parts):
+    """Stable SHA-256 key over the given parts (length-prefixed, so parts can't run together)"""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode('utf-8')
+        elif not isinstance(part, (bytes, bytearray, memoryview)):
+            part = repr(part).encode('utf-8')
+        digest.update(len(part).to_bytes(8, 'big'))
+        digest.update(part)
+    return digest.hexdigest()
+
+class DiskCache:
+    """
+    SQLite-backed key/value store with size-based LRU eviction.
+
+    Values are stored as JSON (strings, numbers, lists and dicts; tuples
+    come back as lists), so loading an entry never runs code. Each entry
+    can carry a tag so a group of entries (e.g. everything derived from one
+    source file) can be invalidated at once.
+    Safe to share between threads; several processes can open the same file.
+    """
+
+    # Bump when the stored value format changes; older files are emptied
+    SCHEMA_VERSION = 1
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        if self._db.execute('PRAGMA user_version').fetchone()[0] != self.SCHEMA_VERSION:
+            # Older files held pickled values, which are never loaded
+            self._db.execute('DROP TABLE IF EXISTS entries')
+            self._db.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            ' key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,'
+            ' tag TEXT, accessed REAL NOT NULL)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS entries_tag ON entries (tag)')
+        self._db.commit()
+        self._total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    def get(self, key, default=None):
+        with self._lock:
+            row = self._db.execute('SELECT value FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            self._db.execute('UPDATE entries SET accessed = ? WHERE key = ?', (time.time(), key))
+            self._db.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, value, tag=None):
+        data = json.dumps(value, ensure_ascii=False)
+        size = len(data.encode('utf-8'))
+        with self._lock:
+            old = self._db.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+            self._db.execute(
+                'INSERT OR REPLACE INTO entries (key, value, size, tag, accessed) VALUES (?, ?, ?, ?, ?)',
+                (key, data, size, tag, time.time())
+            )
+            self._total += size - (old[0] if old else 0)
+            if self._total > self.max_bytes:
+                self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        """Drop least recently used entries until the store is back under 90% of max_bytes"""
+        # Other processes may have written to the file, so start from the real size
+        self._total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        target = self.max_bytes * 0.9
+        while self._total > target:
+            rows = self._db.execute(
+                'SELECT key, size FROM entries ORDER BY accessed LIMIT 256'
+            ).fetchall()
+            if not rows:
+                break
+            victims = []
+            for key, size in rows:
+                if self._total <= target:
+                    break
+                victims.append((key,))
+                self._total -= size
+            self._db.executemany('DELETE FROM entries WHERE key = ?', victims)
+
+    def delete(self, key):
+        with self._lock:
+            row = self._db.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+            if row:
+                self._db.execute('DELETE FROM entries WHERE key = ?', (key,))
+                self._db.commit()
+                self._total -= row[0]
+            return row is not None
+
+    def clear(self, tag=None):
+        """Remove every entry, or only the entries with the given tag"""
+        with self._lock:
+            if tag is None:
+                removed = self._db.execute('DELETE FROM entries').rowcount
+            else:
+                removed = self._db.execute('DELETE FROM entries WHERE tag = ?', (tag,)).rowcount
+            self._db.commit()
+            self._total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        return removed
+
+    def stats(self):
+        with self._lock:
+            entries = self._db.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'entries': entries,
+            'bytes': self._total,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._db.execute('SELECT 1 FROM entries WHERE key = ?', (key,)).fetchone() is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -1,17 +1,30 @@
-from typing import Dict, List, Optional, Tuple, Set
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Set, Union
 import json
 import re
 import os
+import hashlib
+import math
 from datetime import datetime
-from difflib import get_close_matches
+from difflib import SequenceMatcher, get_close_matches
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 import string
 import nltk
 from nltk.tokenize import sent_tokenize, word_tokenize
 from nltk.corpus import wordnet, brown
-from nltk.tag import pos_tag
-from nltk.chunk import ne_chunk
+from nltk.tag import pos_tag_sents
 from nltk.tree import Tree
+import numpy as np
+
+from chapter_index import iter_chapter_spans
+from disk_cache import CACHE_DIR
+
+try:
+    from nltk.chunk import ne_chunker
+except ImportError:
+    # NLTK < 3.9 ships the chunker as a pickle
+    def ne_chunker():
+        return nltk.data.load('chunkers/maxent_ne_chunker/english_ace_multiclass.pickle')
 
 # Download required NLTK resources
 def initialize_nltk():
@@ -58,12 +71,61 @@ class OCRCleaner:
         (r'(?<=\d)O(?=\d)', '0'),        # O between numbers
     ]
 
+    # Every rule token, longest first, plus the 'O' of the digit pattern;
+    # one scan of this pattern stands in for all the passes above
+    _RULE_TOKENS = re.compile(
+        '|'.join(re.escape(token) for token in sorted(OCR_REPLACEMENTS, key=len, reverse=True)) + '|O'
+    )
+
+    @staticmethod
+    def _is_lower(text: str, i: int) -> bool:
+        return 0 <= i < len(text) and 'a' <= text[i] <= 'z'
+
+    @staticmethod
+    def _is_digit_after_rules(text: str, i: int) -> bool:
+        """Whether text[i] is still a digit once the replacements have run"""
+        if not (0 <= i < len(text) and text[i].isdecimal()):
+            return False
+        if text[i] in OCRCleaner.OCR_REPLACEMENTS:
+            # A rule digit is only kept when it touches a lowercase letter
+            return OCRCleaner._is_lower(text, i - 1) or OCRCleaner._is_lower(text, i + 1)
+        return True
+
+    @staticmethod
+    def _apply_rules(match: re.Match) -> str:
+        """Final value of one rule token, as the sequential passes would leave it"""
+        text = match.string
+        start, end = match.span()
+        token = match.group()
+        lower_before = OCRCleaner._is_lower(text, start - 1)
+        lower_after = OCRCleaner._is_lower(text, end)
+
+        # Replacements turn lowercase into lowercase and everything else into
+        # uppercase, so the [a-z] context every rule sees is the original one
+        if token in OCRCleaner.OCR_REPLACEMENTS and not (lower_before or lower_after):
+            token = OCRCleaner.OCR_REPLACEMENTS[token]
+
+        # Sequence patterns, checked against the neighbours' final values.
+        # A kept 0 always touches a lowercase letter, so the 0-between-
+        # uppercase pattern can never fire after the replacements.
+        if token == '1' and lower_before and lower_after:
+            return 'l'
+        if (token == 'O' and OCRCleaner._is_digit_after_rules(text, start - 1)
+                and OCRCleaner._is_digit_after_rules(text, end)):
+            return '0'
+        return token
+
     @staticmethod
     def fix_common_ocr_errors(text: str) -> str:
-        """Basic OCR error correction"""
+        """Basic OCR error correction, applying every rule in a single pass"""
+        return OCRCleaner._RULE_TOKENS.sub(OCRCleaner._apply_rules, text)
+
+    @staticmethod
+    def _fix_common_ocr_errors_sequential(text: str) -> str:
+        """Reference implementation: one full pass per rule, in rule order"""
         # Apply simple replacements
         for wrong, right in OCRCleaner.OCR_REPLACEMENTS.items():
-            text = re.sub(f'(?<![a-z]){wrong}(?![a-z])', right, text)
+            text = re.sub(f'(?<![a-z]){re.escape(wrong)}(?![a-z])', right, text)
         
         # Apply sequence patterns
         for pattern, replacement in OCRCleaner.SEQUENCE_PATTERNS:
@@ -78,17 +140,181 @@ class OCRCleaner:
         text = re.sub(r'\s+', ' ', text)  # normalize whitespace
         return text.strip()
 
+class FuzzyLexiconIndex:
+    """SymSpell-style deletion index for fuzzy word lookup
+
+    Every word is indexed under the strings obtained by deleting up to
+    max_distance characters from its first prefix_length characters. A
+    lookup generates the same deletions for the query, so only words that
+    share a key are scored instead of the whole lexicon.
+
+    Words that differ from the query by more than max_distance edits can
+    still pass difflib's ratio cutoff, or beat the best indexed word, so
+    the lookup also scores the words whose character counts allow a ratio
+    at least that high. Results are the same as get_close_matches(n=1).
+    """
+
+    def __init__(self, words: Iterable[str], max_distance: int = 2, prefix_length: int = 7):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        # A key maps to a bare word while it has one entry, to save memory
+        self._deletes: Dict[str, Union[str, List[str]]] = {}
+        # Sorted by length, so the fallback can scan just the lengths that can match
+        self._words = sorted(set(words), key=lambda word: (len(word), word))
+        for word in self._words:
+            self._add(word)
+        # Character count table for the fallback, built on first use
+        self._counts: Optional[np.ndarray] = None
+
+    def _delete_variants(self, word: str) -> Set[str]:
+        """All strings reachable by deleting up to max_distance prefix characters"""
+        prefix = word[:self.prefix_length]
+        variants = {prefix}
+        frontier = [prefix]
+        for _ in range(self.max_distance):
+            next_frontier = []
+            for item in frontier:
+                for i in range(len(item)):
+                    variant = item[:i] + item[i + 1:]
+                    if variant not in variants:
+                        variants.add(variant)
+                        next_frontier.append(variant)
+            frontier = next_frontier
+        return variants
+
+    def _add(self, word: str):
+        for key in self._delete_variants(word):
+            bucket = self._deletes.get(key)
+            if bucket is None:
+                self._deletes[key] = word
+            elif isinstance(bucket, str):
+                self._deletes[key] = [bucket, word]
+            else:
+                bucket.append(word)
+
+    def lookup(self, word: str, cutoff: float = 0.8) -> Optional[str]:
+        """
+        Best match for word, scored like difflib.get_close_matches(n=1)
+        """
+        matcher = SequenceMatcher()
+        matcher.set_seq2(word)
+        seen = set()
+        indexed = []
+        for key in self._delete_variants(word):
+            bucket = self._deletes.get(key)
+            if bucket is None:
+                continue
+            for candidate in ((bucket,) if isinstance(bucket, str) else bucket):
+                if candidate not in seen:
+                    seen.add(candidate)
+                    indexed.append(candidate)
+
+        best = self._best_match(matcher, indexed, cutoff)
+        if best and best[0] == 1.0:
+            return best[1]
+        # A word outside the index can still score higher, e.g. one that
+        # differs only in its prefix; only words that could beat best are scanned
+        bound = best[0] if best else cutoff
+        others = [candidate for candidate in self._fallback_candidates(word, bound)
+                  if candidate not in seen]
+        best = self._best_match(matcher, others, bound, best)
+        return best[1] if best else None
+
+    @staticmethod
+    def _best_match(matcher: SequenceMatcher, candidates: Iterable[str], cutoff: float,
+                    best: Optional[Tuple[float, str]] = None) -> Optional[Tuple[float, str]]:
+        """Highest (ratio, candidate) of candidates against matcher's seq2 that passes cutoff"""
+        for candidate in candidates:
+            matcher.set_seq1(candidate)
+            if (matcher.real_quick_ratio() >= cutoff and
+                    matcher.quick_ratio() >= cutoff):
+                score = matcher.ratio()
+                # Ties are broken the same way get_close_matches does
+                if score >= cutoff and (best is None or (score, candidate) > best):
+                    best = (score, candidate)
+        return best
+
+    @staticmethod
+    def _char_counts(words: List[str]) -> np.ndarray:
+        """Per-word counts of a-z, with every other character counted in a 27th column"""
+        counts = np.zeros((len(words), 27), dtype=np.uint8)
+        for row, word in enumerate(words):
+            for char in word:
+                column = ord(char) - 97
+                counts[row, column if 0 <= column < 26 else 26] += 1
+        return counts
+
+    def _fallback_candidates(self, word: str, cutoff: float) -> List[str]:
+        """
+        Words whose ratio with word can reach cutoff.
+
+        Shared characters bound the matching blocks from above, the same
+        bound as SequenceMatcher.quick_ratio, so no word that
+        get_close_matches would accept is left out.
+        """
+        if self._counts is None:
+            # One row per character, so a query only reads the rows of its own characters
+            self._counts = np.ascontiguousarray(self._char_counts(self._words).T)
+            self._lengths = np.array([len(w) for w in self._words], dtype=np.int32)
+        # The ratio is at most 2 * min(a, b) / (a + b) for lengths a and b
+        length = len(word)
+        start = np.searchsorted(self._lengths, math.floor(cutoff * length / (2 - cutoff)), 'left')
+        end = (np.searchsorted(self._lengths, math.ceil(length * (2 - cutoff) / cutoff), 'right')
+               if cutoff > 0 else len(self._words))
+        query = self._char_counts([word])[0]
+        shared = np.zeros(end - start, dtype=np.uint16)
+        for column in np.flatnonzero(query):
+            shared += np.minimum(self._counts[column, start:end], query[column])
+        possible = 2.0 * shared >= cutoff * (self._lengths[start:end] + length)
+        return [self._words[start + i] for i in np.flatnonzero(possible)]
+
+# On-disk location of the prebuilt lexicon snapshots, next to the other caches
+LEXICON_CACHE_DIR = CACHE_DIR
+
 class AdvancedLinguisticAnalyzer:
     """Advanced linguistic analysis for OCR text"""
+
+    # Bump when the snapshot layout or the way it is built changes
+    LEXICON_SNAPSHOT_VERSION = 2
+
+    # General academic and technical terms
+    GENERAL_TERMS = [
+        'theorem', 'hypothesis', 'analysis', 'methodology', 'algorithm',
+        'paradigm', 'theory', 'framework', 'implementation', 'structure'
+    ]
+
+    # Domain-specific terms
+    DOMAIN_DICTIONARIES = {
+        'medical': [
+            'diagnosis', 'prognosis', 'etiology', 'pathology', 'syndrome',
+            'chronic', 'acute', 'benign', 'malignant', 'idiopathic'
+        ],
+        'technical': [
+            'algorithm', 'database', 'interface', 'protocol', 'bandwidth',
+            'latency', 'throughput', 'middleware', 'architecture', 'framework'
+        ],
+        'scientific': [
+            'hypothesis', 'experiment', 'variable', 'correlation', 'causation',
+            'methodology', 'analysis', 'synthesis', 'derivative', 'integral'
+        ],
+        'legal': [
+            'statute', 'jurisdiction', 'precedent', 'plaintiff', 'defendant',
+            'tort', 'liability', 'prosecution', 'litigation', 'verdict'
+        ]
+    }
     
-    def __init__(self, domain: Optional[str] = None):
+    def __init__(self, domain: Optional[str] = None, use_cache: bool = True):
         self.domain = domain
-        self.domain_terms = self._load_domain_terms(domain)
-        self.brown_words = set(word.lower() for word in brown.words())
-        self.common_words = set(nltk.corpus.words.words())
+        lexicon = self._load_lexicon(domain) if use_cache else self._build_lexicon(domain)
+        self.domain_terms = lexicon['domain_terms']
+        self.common_words = lexicon['common_words']
         
-        # Build frequency distribution from Brown corpus for word probability
-        self.word_freq = nltk.FreqDist(word.lower() for word in brown.words())
+        # Frequency distribution from Brown corpus for word probability
+        self.word_freq = nltk.FreqDist(lexicon['word_freq'])
+        self.brown_words = set(self.word_freq)
+
+        # Fuzzy lookup index, built on first use
+        self._fuzzy_index: Optional[FuzzyLexiconIndex] = None
         
         # Common sentence structures (Subject-Verb-Object patterns)
         self.valid_sentence_patterns = [
@@ -96,55 +322,153 @@ class AdvancedLinguisticAnalyzer:
             r'PRP (VB |VBD |VBG |VBN |VBP |VBZ )+',
             r'WDT |WP |WRB .+(VB |VBD |VBG |VBN |VBP |VBZ )+',
         ]
+        self._sentence_patterns = [re.compile(pattern) for pattern in self.valid_sentence_patterns]
+
+        # Named entity chunker, loaded on first use
+        self._ne_chunker = None
     
-    def _load_domain_terms(self, domain: Optional[str]) -> Set[str]:
-        """Load domain-specific terminology"""
-        domain_terms = set()
-        
-        # Add general academic and technical terms
-        domain_terms.update([
-            'theorem', 'hypothesis', 'analysis', 'methodology', 'algorithm',
-            'paradigm', 'theory', 'framework', 'implementation', 'structure'
-        ])
-        
-        # Domain-specific terms
-        domain_dictionaries = {
-            'medical': [
-                'diagnosis', 'prognosis', 'etiology', 'pathology', 'syndrome',
-                'chronic', 'acute', 'benign', 'malignant', 'idiopathic'
-            ],
-            'technical': [
-                'algorithm', 'database', 'interface', 'protocol', 'bandwidth',
-                'latency', 'throughput', 'middleware', 'architecture', 'framework'
-            ],
-            'scientific': [
-                'hypothesis', 'experiment', 'variable', 'correlation', 'causation',
-                'methodology', 'analysis', 'synthesis', 'derivative', 'integral'
-            ],
-            'legal': [
-                'statute', 'jurisdiction', 'precedent', 'plaintiff', 'defendant',
-                'tort', 'liability', 'prosecution', 'litigation', 'verdict'
-            ]
+    @property
+    def fuzzy_index(self) -> FuzzyLexiconIndex:
+        """Deletion index over the common words and domain terms"""
+        if self._fuzzy_index is None:
+            self._fuzzy_index = FuzzyLexiconIndex(
+                self.common_words.union(self.domain_terms)
+            )
+        return self._fuzzy_index
+
+    @staticmethod
+    def _corpus_stamp(resource: str) -> Optional[List]:
+        """Location, size and mtime of an installed NLTK resource"""
+        try:
+            pointer = nltk.data.find(resource)
+        except LookupError:
+            return None
+        path = getattr(pointer, 'path', None) or pointer.zipfile.filename
+        stat = os.stat(path)
+        return [path, stat.st_size, stat.st_mtime_ns]
+
+    @classmethod
+    def _lexicon_fingerprint(cls, domain: Optional[str]) -> str:
+        """
+        Hash of everything the lexicon is built from, so a snapshot is
+        rebuilt whenever the NLTK data or the domain dictionary changes
+        """
+        sources = {
+            'version': cls.LEXICON_SNAPSHOT_VERSION,
+            'nltk': nltk.__version__,
+            'domain': domain,
+            'general_terms': cls.GENERAL_TERMS,
+            'domain_terms': cls.DOMAIN_DICTIONARIES.get(domain),
+            'corpora': [cls._corpus_stamp(resource) for resource in
+                        ('corpora/brown', 'corpora/words', 'corpora/wordnet')]
         }
+        return hashlib.sha256(json.dumps(sources, sort_keys=True).encode('utf-8')).hexdigest()
+
+    @classmethod
+    def _build_lexicon(cls, domain: Optional[str]) -> Dict:
+        """Build the word set, frequency table and domain terms from NLTK"""
+        word_freq = Counter(word.lower() for word in brown.words())
+        return {
+            'domain_terms': cls._load_domain_terms(domain),
+            'common_words': set(nltk.corpus.words.words()),
+            'word_freq': dict(word_freq)
+        }
+
+    @classmethod
+    def _load_lexicon(cls, domain: Optional[str], cache_dir: str = LEXICON_CACHE_DIR) -> Dict:
+        """
+        Load the lexicon snapshot for this domain, building it if the
+        snapshot is missing or stale
+
+        Snapshots are plain JSON (sorted word lists and the frequency table)
+        with the fingerprint they were built for, so loading one never runs
+        code from the cache directory.
+        """
+        name = f"lexicon-{domain or 'general'}"
+        fingerprint = cls._lexicon_fingerprint(domain)
+        snapshot_path = os.path.join(cache_dir, f"{name}-{fingerprint[:16]}.json")
+
+        try:
+            with open(snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            if snapshot.get('fingerprint') == fingerprint:
+                return {
+                    'domain_terms': set(snapshot['domain_terms']),
+                    'common_words': set(snapshot['common_words']),
+                    'word_freq': snapshot['word_freq']
+                }
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            pass
+
+        lexicon = cls._build_lexicon(domain)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'fingerprint': fingerprint,
+                    'domain_terms': sorted(lexicon['domain_terms']),
+                    'common_words': sorted(lexicon['common_words']),
+                    'word_freq': lexicon['word_freq']
+                }, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, snapshot_path)
+
+            # Drop snapshots built from older data, and old pickle snapshots
+            for entry in os.listdir(cache_dir):
+                if (entry.startswith(f"{name}-") and entry.endswith(('.json', '.pickle'))
+                        and os.path.join(cache_dir, entry) != snapshot_path):
+                    os.remove(os.path.join(cache_dir, entry))
+        except OSError as e:
+            print(f"Could not save lexicon snapshot: {str(e)}")
+
+        return lexicon
+
+    @classmethod
+    def _load_domain_terms(cls, domain: Optional[str]) -> Set[str]:
+        """Load domain-specific terminology"""
+        domain_terms = set(cls.GENERAL_TERMS)
         
-        if domain and domain in domain_dictionaries:
-            domain_terms.update(domain_dictionaries[domain])
+        if domain and domain in cls.DOMAIN_DICTIONARIES:
+            domain_terms.update(cls.DOMAIN_DICTIONARIES[domain])
             
             # Add related terms from WordNet
-            for term in domain_dictionaries[domain]:
+            for term in cls.DOMAIN_DICTIONARIES[domain]:
                 synsets = wordnet.synsets(term)
                 for synset in synsets:
                     domain_terms.update(lemma.name() for lemma in synset.lemmas())
         
         return domain_terms
 
+    @property
+    def ne_chunker(self):
+        """Named entity chunker, loaded once per analyzer"""
+        if self._ne_chunker is None:
+            self._ne_chunker = ne_chunker()
+        return self._ne_chunker
+
     def analyze_sentence_structure(self, sentence: str) -> Dict:
         """
         Perform detailed analysis of sentence structure
         """
-        tokens = word_tokenize(sentence)
-        pos_tags = pos_tag(tokens)
-        
+        return self.analyze_sentence_structures([sentence])[0]
+
+    def analyze_sentence_structures(self, sentences: List[str]) -> List[Dict]:
+        """
+        Analyze a batch of sentences, tagging and chunking them together
+        """
+        token_lists = [word_tokenize(sentence) for sentence in sentences]
+        tagged_sentences = pos_tag_sents(token_lists)
+        chunker = self.ne_chunker
+
+        return [
+            self._structure_analysis(tokens, pos_tags, chunker.parse(pos_tags))
+            for tokens, pos_tags in zip(token_lists, tagged_sentences)
+        ]
+
+    def _structure_analysis(self, tokens: List[str], pos_tags: List[Tuple[str, str]], named_entities) -> Dict:
+        """
+        Build the structure analysis of one tagged and chunked sentence
+        """
         # Create POS tag string for pattern matching
         pos_string = ' '.join(tag for word, tag in pos_tags)
         
@@ -158,8 +482,8 @@ class AdvancedLinguisticAnalyzer:
         }
         
         # Check sentence patterns
-        for pattern in self.valid_sentence_patterns:
-            if re.search(pattern, pos_string):
+        for pattern in self._sentence_patterns:
+            if pattern.search(pos_string):
                 analysis['structure_type'] = 'valid'
                 break
         
@@ -189,7 +513,6 @@ class AdvancedLinguisticAnalyzer:
         analysis['grammatical_elements'] = elements
         
         # Named Entity Recognition
-        named_entities = ne_chunk(pos_tags)
         if isinstance(named_entities, Tree):
             for subtree in named_entities:
                 if isinstance(subtree, Tree):
@@ -249,9 +572,9 @@ class AdvancedLinguisticAnalyzer:
             return word, 0.8
         
         # Try fuzzy matching
-        matches = get_close_matches(word_lower, self.common_words.union(self.domain_terms), n=1, cutoff=0.8)
-        if matches:
-            return matches[0], 0.6
+        match = self.fuzzy_index.lookup(word_lower, cutoff=0.8)
+        if match:
+            return match, 0.6
         
         # If still no match, try character-based similarity
         for valid_word in self.domain_terms:
@@ -260,25 +583,45 @@ class AdvancedLinguisticAnalyzer:
         
         return word, 0.1
 
+# Per-process analyzer used by the sentence worker pool
+_worker_analyzer: Optional[AdvancedLinguisticAnalyzer] = None
+
+def _init_sentence_worker(domain: Optional[str]):
+    """Load the analyzer held by each pool process"""
+    global _worker_analyzer
+    _worker_analyzer = AdvancedLinguisticAnalyzer(domain)
+
+def _analyze_sentence_batch(sentences: List[str]) -> List[Dict]:
+    """Analyze a batch of sentences inside a pool process"""
+    return EnhancedOCRCleaner.analyze_sentences(_worker_analyzer, sentences)
+
 class EnhancedOCRCleaner(OCRCleaner):
     """Enhanced OCR cleaner with advanced linguistic analysis"""
     
-    def __init__(self, domain: Optional[str] = None):
+    def __init__(self, domain: Optional[str] = None, workers: int = 1, batch_size: int = 64):
+        """
+        workers > 1 analyzes sentences on a process pool (None means one
+        per CPU core), sending them in batches of batch_size
+        """
+        self.domain = domain
         self.linguistic_analyzer = AdvancedLinguisticAnalyzer(domain)
-    
-    def clean_and_analyze_text(self, text: str) -> Tuple[str, Dict]:
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def close(self):
+        """Shut down the sentence worker pool, if one was started"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    @staticmethod
+    def analyze_sentences(analyzer: AdvancedLinguisticAnalyzer, sentences: List[str]) -> List[Dict]:
         """
-        Clean text and provide detailed linguistic analysis
+        Clean, verify and analyze each sentence
         """
-        # Basic OCR cleaning
-        cleaned_text = self.fix_common_ocr_errors(text)
-        
-        # Split into sentences
-        sentences = sent_tokenize(cleaned_text)
-        
-        # Analyze each sentence
-        sentence_analyses = []
         cleaned_sentences = []
+        sentence_confidences = []
         
         for sentence in sentences:
             # Clean and verify words in sentence
@@ -287,22 +630,59 @@ class EnhancedOCRCleaner(OCRCleaner):
             word_confidences = []
             
             for word in words:
-                cleaned_word, confidence = self.linguistic_analyzer.verify_word(word)
+                cleaned_word, confidence = analyzer.verify_word(word)
                 cleaned_words.append(cleaned_word)
                 word_confidences.append(confidence)
             
-            cleaned_sentence = ' '.join(cleaned_words)
-            cleaned_sentences.append(cleaned_sentence)
-            
-            # Analyze sentence structure
-            structure_analysis = self.linguistic_analyzer.analyze_sentence_structure(cleaned_sentence)
+            cleaned_sentences.append(' '.join(cleaned_words))
+            sentence_confidences.append(sum(word_confidences) / len(word_confidences))
             
-            sentence_analyses.append({
+        # Analyze sentence structure for the whole batch
+        structure_analyses = analyzer.analyze_sentence_structures(cleaned_sentences)
+        
+        return [
+            {
                 'original': sentence,
                 'cleaned': cleaned_sentence,
-                'word_confidence': sum(word_confidences) / len(word_confidences),
+                'word_confidence': confidence,
                 'structure_analysis': structure_analysis
-            })
+            }
+            for sentence, cleaned_sentence, confidence, structure_analysis
+            in zip(sentences, cleaned_sentences, sentence_confidences, structure_analyses)
+        ]
+
+    def _analyze_sentences_parallel(self, sentences: List[str]) -> List[Dict]:
+        """Shard sentences across the worker pool, keeping their order"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_sentence_worker,
+                initargs=(self.domain,)
+            )
+
+        batches = [sentences[i:i + self.batch_size]
+                   for i in range(0, len(sentences), self.batch_size)]
+        sentence_analyses = []
+        for batch_analyses in self._executor.map(_analyze_sentence_batch, batches):
+            sentence_analyses.extend(batch_analyses)
+        return sentence_analyses
+    
+    def clean_and_analyze_text(self, text: str) -> Tuple[str, Dict]:
+        """
+        Clean text and provide detailed linguistic analysis
+        """
+        # Basic OCR cleaning
+        cleaned_text = self.fix_common_ocr_errors(text)
+        
+        # Split into sentences
+        sentences = sent_tokenize(cleaned_text)
+        
+        # Analyze each sentence, in parallel when there is more than one batch
+        if self.workers > 1 and len(sentences) > self.batch_size:
+            sentence_analyses = self._analyze_sentences_parallel(sentences)
+        else:
+            sentence_analyses = self.analyze_sentences(self.linguistic_analyzer, sentences)
+        cleaned_sentences = [sa['cleaned'] for sa in sentence_analyses]
         
         # Compile overall analysis
         analysis = {
@@ -322,14 +702,35 @@ class EnhancedOCRCleaner(OCRCleaner):
 
 # Update the BookParser class to use the enhanced cleaner:
 class BookParser:
-    def __init__(self, file_path: str, domain: Optional[str] = None):
+    # Chapter headings, tried in order
+    CHAPTER_PATTERNS = [
+        r'(?i)^chapter\s+\d+',  # Matches "Chapter 1", "CHAPTER 2", etc.
+        r'(?i)^[IVX]+\.',       # Matches Roman numerals with period
+        r'(?i)^\d+\.',          # Matches numeric chapter numbers with period
+    ]
+
+    ENCODINGS = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
+
+    def __init__(self, file_path: str, domain: Optional[str] = None, stream: bool = False,
+                 workers: int = 1):
+        """
+        With stream=True nothing is read up front; use stream_to_jsonl()
+        to process the book chunk by chunk. workers is passed on to
+        EnhancedOCRCleaner for parallel sentence analysis.
+        """
         self.file_path = file_path
-        self.ocr_cleaner = EnhancedOCRCleaner(domain)
-        self.content = self._read_and_clean_file()
+        self.ocr_cleaner = EnhancedOCRCleaner(domain, workers=workers)
+        self.linguistic_analysis = None
+        try:
+            self.content = None if stream else self._read_and_clean_file()
+        except BaseException:
+            # Don't leave the sentence worker pool running
+            self.ocr_cleaner.close()
+            raise
 
     def _read_file(self) -> str:
         """Read file with multiple encoding attempts"""
-        encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
+        encodings = self.ENCODINGS
         errors = []
         
         for encoding in encodings:
@@ -348,6 +749,137 @@ class BookParser:
         raise ValueError(f"Could not read {self.file_path} with any supported encoding. "
                         f"Errors: {'; '.join(errors)}")
 
+    def _detect_encoding(self, block_size: int = 1 << 20) -> str:
+        """Find the first encoding that decodes the file, reading it in blocks"""
+        errors = []
+
+        for encoding in self.ENCODINGS:
+            try:
+                with open(self.file_path, 'r', encoding=encoding) as file:
+                    while file.read(block_size):
+                        pass
+                print(f"Successfully read file using {encoding} encoding")
+                return encoding
+            except UnicodeDecodeError as e:
+                errors.append(f"{encoding}: {str(e)}")
+
+        raise ValueError(f"Could not read {self.file_path} with any supported encoding. "
+                        f"Errors: {'; '.join(errors)}")
+
+    def _iter_paragraphs(self, encoding: str, max_size: int) -> Iterator[str]:
+        """
+        Yield the file paragraph by paragraph; a paragraph longer than
+        max_size is cut at the next line break
+        """
+        lines = []
+        size = 0
+        with open(self.file_path, 'r', encoding=encoding) as file:
+            for line in file:
+                if line.strip():
+                    lines.append(line.rstrip('\n'))
+                    size += len(line)
+                    if size < max_size:
+                        continue
+                if lines:
+                    yield '\n'.join(lines)
+                    lines = []
+                    size = 0
+        if lines:
+            yield '\n'.join(lines)
+
+    def stream_to_jsonl(self, output_file: str, chunk_size: int = 20000) -> Dict:
+        """
+        Clean, analyze and split the book incrementally, writing JSON Lines
+
+        Paragraphs are grouped into chunks of about chunk_size characters.
+        Each chunk is cleaned and analyzed on its own, and its records are
+        written out before the next chunk is read. Memory therefore depends
+        on the chunk size, not on the length of the book. Records are:
+        'text' (cleaned content), 'sentence' (per-sentence analysis),
+        'chapter' (written when a chapter ends) and a final 'summary'.
+        """
+        heading_patterns = [re.compile(pattern) for pattern in self.CHAPTER_PATTERNS]
+        encoding = self._detect_encoding()
+
+        totals = {'sentences': 0, 'complexity': 0.0, 'completeness': 0.0, 'confidence': 0.0}
+        chapter = {'title': 'Introduction', 'chapter_number': 0, 'word_count': 0}
+        chapters = []
+        pending = []
+        pending_size = 0
+
+        def write(out, record):
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+        def flush_chunk(out):
+            nonlocal pending_size
+            text = '\n\n'.join(pending)
+            pending.clear()
+            pending_size = 0
+            if not text.strip():
+                return
+            cleaned, analysis = self.ocr_cleaner.clean_and_analyze_text(text)
+            chapter['word_count'] += len(cleaned.split())
+            write(out, {'type': 'text', 'chapter_number': chapter['chapter_number'], 'text': cleaned})
+            for sentence in analysis['detailed_analysis']:
+                totals['sentences'] += 1
+                totals['complexity'] += sentence['structure_analysis']['complexity']
+                totals['completeness'] += sentence['structure_analysis']['completeness']
+                totals['confidence'] += sentence['word_confidence']
+                write(out, dict(sentence, type='sentence', chapter_number=chapter['chapter_number']))
+
+        def close_chapter(out):
+            if chapter['word_count']:
+                chapters.append(dict(chapter))
+                write(out, dict(chapter, type='chapter'))
+
+        with open(output_file, 'w', encoding='utf-8') as out:
+            for paragraph in self._iter_paragraphs(encoding, chunk_size):
+                heading = next((match for match in (pattern.match(paragraph) for pattern in heading_patterns)
+                                if match), None)
+                if heading:
+                    flush_chunk(out)
+                    close_chapter(out)
+                    chapter = {
+                        'title': heading.group(0).strip(),
+                        'chapter_number': chapter['chapter_number'] + 1,
+                        'word_count': 0
+                    }
+                    paragraph = paragraph[heading.end():]
+
+                pending.append(paragraph)
+                pending_size += len(paragraph)
+                if pending_size >= chunk_size:
+                    flush_chunk(out)
+
+            flush_chunk(out)
+            close_chapter(out)
+
+            total_sentences = totals['sentences']
+            total_words = sum(ch['word_count'] for ch in chapters)
+            summary = {
+                'metadata': {
+                    'filename': os.path.basename(self.file_path),
+                    'processing_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                    'word_count': total_words,
+                },
+                'linguistic_analysis': {
+                    'sentence_level': {
+                        'total_sentences': total_sentences,
+                        'average_complexity': totals['complexity'] / total_sentences if total_sentences else 0,
+                        'average_completeness': totals['completeness'] / total_sentences if total_sentences else 0,
+                        'average_confidence': totals['confidence'] / total_sentences if total_sentences else 0
+                    }
+                },
+                'statistics': {
+                    'total_chapters': len(chapters),
+                    'average_chapter_length': total_words // len(chapters) if chapters else 0,
+                    'total_words': total_words
+                }
+            }
+            write(out, dict(summary, type='summary'))
+
+        return summary
+
     def _read_and_clean_file(self) -> str:
         """Read and clean the file content"""
         raw_content = self._read_file()
@@ -380,38 +912,35 @@ class BookParser:
     def _split_into_chapters(self) -> List[Dict]:
         """Split the content into chapters"""
         # This is a basic implementation - you might want to make it more sophisticated
-        chapter_patterns = [
-            r'(?i)^chapter\s+\d+',  # Matches "Chapter 1", "CHAPTER 2", etc.
-            r'(?i)^[IVX]+\.',       # Matches Roman numerals with period
-            r'(?i)^\d+\.',          # Matches numeric chapter numbers with period
-        ]
+        chapter_patterns = self.CHAPTER_PATTERNS
         
         chapters = []
-        current_content = self.content
 
-        # Try each pattern until we find one that works
+        # Try each pattern until we find one that works; headings are matched
+        # at line starts, like the streaming mode does per paragraph
         for pattern in chapter_patterns:
-            splits = re.split(f'({pattern})', current_content)
-            if len(splits) > 1:
+            spans = list(iter_chapter_spans(self.content, re.compile(pattern, re.MULTILINE)))
+            if len(spans) > 1:
                 # First part might be introduction/preface
-                if splits[0].strip():
+                introduction = spans[0].text(self.content).strip()
+                if introduction:
                     chapters.append({
                         'title': 'Introduction',
-                        'content': splits[0].strip(),
+                        'content': introduction,
                         'chapter_number': 0
                     })
 
-                # Process the rest of the chapters
-                for i in range(1, len(splits), 2):
-                    if i + 1 < len(splits):
-                        title = splits[i].strip()
-                        content = splits[i + 1].strip()
-                        if title and content:
-                            chapters.append({
-                                'title': title,
-                                'content': content,
-                                'chapter_number': len(chapters) + 1
-                            })
+                # Process the rest of the chapters, numbered from 1 like the streaming mode
+                number = 0
+                for span in spans[1:]:
+                    content = span.text(self.content).strip()
+                    if span.title and content:
+                        number += 1
+                        chapters.append({
+                            'title': span.title,
+                            'content': content,
+                            'chapter_number': number
+                        })
                 break  # If we found chapters, stop trying other patterns
 
         # If no chapters found, treat the entire content as a single chapter
@@ -425,41 +954,69 @@ class BookParser:
         return chapters
 
 # Example usage:
-def convert_book_to_json(input_file: str, domain: Optional[str] = None, output_file: Optional[str] = None):
+def _print_conversion_summary(input_file: str, output_file: str, book_data: Dict):
+    """Print the statistics of a converted book (its JSON data or JSON Lines summary)"""
+    statistics = book_data['statistics']
+    print("\nConversion complete!")
+    print(f"Input file: {input_file}")
+    print(f"Output file: {output_file}")
+    print("\nSummary:")
+    print(f"- Total chapters: {statistics['total_chapters']}")
+    print(f"- Total words: {statistics['total_words']}")
+    print(f"- Average chapter length: {statistics['average_chapter_length']} words")
+
+    if 'linguistic_analysis' in book_data:
+        analysis = book_data['linguistic_analysis']['sentence_level']
+        print("\nLinguistic Analysis:")
+        print(f"- Average sentence complexity: {analysis['average_complexity']:.2f}")
+        print(f"- Average sentence completeness: {analysis['average_completeness']:.2f}")
+        print(f"- Average word confidence: {analysis['average_confidence']:.2f}")
+
+def convert_book_to_json(input_file: str, domain: Optional[str] = None, output_file: Optional[str] = None,
+                         workers: int = 1):
     """Convert a book file to JSON with OCR cleaning and linguistic analysis"""
     try:
         # Create parser and process the book
-        parser = BookParser(input_file, domain)
-        book_data = parser.parse()
-        
-        # Determine output file name if not provided
-        if not output_file:
-            output_file = os.path.splitext(input_file)[0] + '.json'
-        
-        # Save to JSON file
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(book_data, f, indent=2, ensure_ascii=False)
+        parser = BookParser(input_file, domain, workers=workers)
+        try:
+            book_data = parser.parse()
+            
+            # Determine output file name if not provided
+            if not output_file:
+                output_file = os.path.splitext(input_file)[0] + '.json'
+            
+            # Save to JSON file
+            with open(output_file, 'w', encoding='utf-8') as f:
+                json.dump(book_data, f, indent=2, ensure_ascii=False)
+        finally:
+            parser.ocr_cleaner.close()
         
         # Print summary
-        print(f"\nConversion complete!")
-        print(f"Input file: {input_file}")
-        print(f"Output file: {output_file}")
-        print(f"\nSummary:")
-        print(f"- Total chapters: {book_data['statistics']['total_chapters']}")
-        print(f"- Total words: {book_data['statistics']['total_words']}")
-        print(f"- Average chapter length: {book_data['statistics']['average_chapter_length']} words")
-        
-        if 'linguistic_analysis' in book_data:
-            analysis = book_data['linguistic_analysis']['sentence_level']
-            print(f"\nLinguistic Analysis:")
-            print(f"- Average sentence complexity: {analysis['average_complexity']:.2f}")
-            print(f"- Average sentence completeness: {analysis['average_completeness']:.2f}")
-            print(f"- Average word confidence: {analysis['average_confidence']:.2f}")
+        _print_conversion_summary(input_file, output_file, book_data)
         
     except Exception as e:
         print(f"Error converting file: {str(e)}")
         raise
     
+def convert_book_to_jsonl(input_file: str, domain: Optional[str] = None, output_file: Optional[str] = None,
+                          chunk_size: int = 20000, workers: int = 1):
+    """Stream a book file to JSON Lines with OCR cleaning and linguistic analysis"""
+    try:
+        if not output_file:
+            output_file = os.path.splitext(input_file)[0] + '.jsonl'
+
+        parser = BookParser(input_file, domain, stream=True, workers=workers)
+        try:
+            summary = parser.stream_to_jsonl(output_file, chunk_size=chunk_size)
+        finally:
+            parser.ocr_cleaner.close()
+
+        _print_conversion_summary(input_file, output_file, summary)
+
+    except Exception as e:
+        print(f"Error converting file: {str(e)}")
+        raise
+
 # Usage:
 if __name__ == "__main__":
     initialize_nltk()
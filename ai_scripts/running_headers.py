@@ -0,0 +1,158 @@
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+_DIGITS = re.compile(r'\d+')
+_WORDS = re.compile(r'[a-z#]+')
+# Printer's signature marks ('A', 'B 2') differ from page to page, so at the
+# bottom edge they are all counted under this one key
+_SIGNATURE = '<signature>'
+
+def normalize_line(line: str) -> str:
+    """
+    Key under which a line is counted: lowercase letters only, numbers as '#'.
+
+    '12  MOROCCO  THAT  WAS' and '14 MOROCCO THAT WAS.' both become
+    '# morocco that was', so a header counts once per page whatever its page
+    number and OCR punctuation.
+    """
+    return ' '.join(_WORDS.findall(_DIGITS.sub('#', line.lower())))
+
+def _number(line: str) -> int:
+    """The first number in line"""
+    return int(_DIGITS.search(line).group())
+
+def _edge_lines(lines: List[str], depth: int, from_bottom: bool) -> List[int]:
+    """Indices of the first (or last) depth non-blank lines"""
+    order = range(len(lines) - 1, -1, -1) if from_bottom else range(len(lines))
+    indices = []
+    for i in order:
+        if lines[i].strip():
+            indices.append(i)
+            if len(indices) == depth:
+                break
+    return indices
+
+class RunningHeaderDetector:
+    """
+    Finds running headers, footers and page numbers from cross-page statistics.
+
+    Every page contributes the normalized form of its top and bottom depth
+    lines to a hashed frequency table (one per edge). A line seen at the same edge
+    of at least min_pages pages is a running line. A bare number is a page
+    number when it keeps the same offset from the page's position on at least
+    min_pages pages, so a year alone on a title page stays. Removing them is
+    then a set lookup for a few lines per page, instead of regex scans over
+    the whole text that also hit legitimate capitals.
+    """
+
+    def __init__(self, depth: int = 2, min_pages: int = 3, max_length: int = 80):
+        self.depth = depth
+        self.min_pages = min_pages
+        self.max_length = max_length
+        self.counts = {'top': Counter(), 'bottom': Counter()}
+        # Bare numbers by their offset from the page's position, per edge
+        self.numbering = {'top': Counter(), 'bottom': Counter()}
+        # How often each top line carried an even (verso) page number
+        self.verso: Counter = Counter()
+        self.examples: Dict[str, str] = {}
+        self.pages = 0
+
+    def _key(self, line: str) -> Optional[str]:
+        line = line.strip()
+        if len(line) > self.max_length:
+            return None
+        return normalize_line(line) or None
+
+    def _edge_key(self, key: Optional[str], edge: str) -> Optional[str]:
+        if key and key != '#' and edge == 'bottom' and len(key.replace(' #', '')) == 1:
+            return _SIGNATURE
+        return key
+
+    def add_page(self, text: str):
+        lines = text.splitlines()
+        page = self.pages
+        self.pages += 1
+        for edge, counts in self.counts.items():
+            keys = set()
+            offsets = set()
+            for i in _edge_lines(lines, self.depth, edge == 'bottom'):
+                key = self._edge_key(self._key(lines[i]), edge)
+                if not key:
+                    continue
+                keys.add(key)
+                self.examples.setdefault(key, lines[i].strip())
+                if key == '#':
+                    offsets.add(_number(lines[i]) - page)
+                elif edge == 'top' and '#' in key and _number(lines[i]) % 2 == 0:
+                    self.verso[key] += 1
+            # Each line counts once per page and edge
+            counts.update(keys)
+            self.numbering[edge].update(offsets)
+
+    def fit(self, pages: Iterable[str]) -> 'RunningHeaderDetector':
+        for text in pages:
+            self.add_page(text)
+        return self
+
+    def is_running(self, key: Optional[str], edge: str) -> bool:
+        if key is None:
+            return False
+        # A single letter at the bottom is a signature mark only if the book has them
+        key = self._edge_key(key, edge)
+        return self.counts[edge][key] >= self.min_pages
+
+    def is_page_number(self, line: str, edge: str, page: int) -> bool:
+        """Whether line, at edge of the page-th page fitted, continues the book's page numbering"""
+        if self._key(line) != '#':
+            return False
+        return self.numbering[edge][_number(line) - page] >= self.min_pages
+
+    def strip_page(self, text: str, page: Optional[int] = None) -> str:
+        """
+        text without its running header and footer lines. page is its position
+        among the fitted pages; without it, bare numbers are only dropped when
+        min_pages pages have one at that edge.
+        """
+        lines = text.splitlines()
+        removed = set()
+        for edge in self.counts:
+            # Peel lines off the edge until one is not a running line
+            for i in _edge_lines(lines, self.depth, edge == 'bottom'):
+                key = self._key(lines[i])
+                if key == '#' and page is not None:
+                    running = self.is_page_number(lines[i], edge, page)
+                else:
+                    running = self.is_running(key, edge)
+                if not running:
+                    break
+                removed.add(i)
+        return '\n'.join(line for i, line in enumerate(lines) if i not in removed)
+
+    def title(self) -> Optional[str]:
+        """
+        The most frequent running header without its page number, e.g. the
+        book title. Headers are counted with or without their number; a tie
+        goes to the one on even (verso) pages, where books print their title
+        and chapter titles go on the facing page.
+        """
+        totals: Counter = Counter()
+        verso: Counter = Counter()
+        keys: Dict[str, str] = {}
+        for key, count in self.counts['top'].most_common():
+            text = ' '.join(word for word in key.split() if word != '#')
+            if text:
+                totals[text] += count
+                verso[text] += self.verso[key]
+                keys.setdefault(text, key)
+        if not totals:
+            return None
+        text = max(totals, key=lambda text: (totals[text], verso[text]))
+        if totals[text] < self.min_pages:
+            return None
+        return ' '.join(_DIGITS.sub('', self.examples[keys[text]]).split()) or None
+
+def strip_running_headers(pages: List[str], **options) -> List[str]:
+    """Page texts with the lines that repeat at their top and bottom removed"""
+    detector = RunningHeaderDetector(**options).fit(pages)
+    return [detector.strip_page(text, page) for page, text in enumerate(pages)]
@@ -0,0 +1,26 @@
+import unittest
+from difflib import get_close_matches
+
+from ocr_issues_cleaner import FuzzyLexiconIndex
+
+class FuzzyLexiconIndexTest(unittest.TestCase):
+    def assertSameAsDifflib(self, lexicon, word):
+        expected = get_close_matches(word, lexicon, n=1, cutoff=0.8)
+        self.assertEqual(FuzzyLexiconIndex(lexicon).lookup(word), expected[0] if expected else None)
+
+    def test_indexed_match(self):
+        self.assertSameAsDifflib(['morocco', 'sultan', 'vizier'], 'moroco')
+
+    def test_match_outside_the_index(self):
+        # Too many prefix edits for the index, but within difflib's cutoff
+        self.assertSameAsDifflib(['humiliating', 'hurting'], 'hutliting')
+
+    def test_better_match_outside_the_index_wins(self):
+        # The index finds xyzabcdefghijklmqr (0.865), difflib prefers abcdefghijklmnop (0.914)
+        self.assertSameAsDifflib(['abcdefghijklmnop', 'xyzabcdefghijklmqr'], 'xyzabcdefghijklmnop')
+
+    def test_no_match(self):
+        self.assertIsNone(FuzzyLexiconIndex(['sultan']).lookup('tangier'))
+
+if __name__ == '__main__':
+    unittest.main()
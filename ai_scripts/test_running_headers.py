@@ -0,0 +1,38 @@
+import unittest
+
+from running_headers import RunningHeaderDetector, strip_running_headers
+
+WORDS = "sultan palace gate dawn court hills camp parasol mission tangier fez rabat".split()
+
+def page(i, top=None, bottom=None):
+    """A page whose body lines appear on no other page"""
+    body = [f"the {WORDS[i % 12]} and the {WORDS[(i * 5 + 1) % 12]} {'x' * i}",
+            f"{WORDS[(i * 7 + 2) % 12]} beyond the {WORDS[(i + 3) % 12]} {'y' * i}"]
+    return '\n'.join(([top] if top else []) + body + ([bottom] if bottom else []))
+
+class RunningHeaderDetectorTest(unittest.TestCase):
+    def test_page_numbers_are_stripped_but_a_lone_year_stays(self):
+        pages = [page(0, bottom='1921')] + [page(i, bottom=str(i + 10)) for i in range(1, 8)]
+        stripped = strip_running_headers(pages)
+
+        self.assertTrue(stripped[0].endswith('1921'))
+        for text in stripped[1:]:
+            self.assertFalse(text.splitlines()[-1].isdigit())
+
+    def test_title_tie_goes_to_the_verso_header(self):
+        # Chapter title on odd pages, book title on even ones, as often each
+        pages = [page(i, top=f"{i} MOROCCO THAT WAS" if i % 2 == 0 else f"THE MOORISH COURT {i}")
+                 for i in range(3, 13)]
+        detector = RunningHeaderDetector().fit(pages)
+
+        self.assertEqual(detector.counts['top']['# morocco that was'],
+                         detector.counts['top']['the moorish court #'])
+        self.assertEqual(detector.title(), 'MOROCCO THAT WAS')
+
+    def test_signature_marks_must_recur(self):
+        pages = [page(i, bottom=str(i + 1)) for i in range(6)]
+        pages[3] = page(3, bottom='I')
+        self.assertTrue(strip_running_headers(pages)[3].endswith('\nI'))
+
+if __name__ == '__main__':
+    unittest.main()
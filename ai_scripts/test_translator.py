@@ -0,0 +1,165 @@
+import threading
+import time
+import unittest
+
+from translator import TokenBucket, translate_chunks, translate_segments
+
+class RateLimited(Exception):
+    status_code = 429
+
+class StubTranslator:
+    """Upper-cases text after a delay; the first request for each chunk in throttled gets a 429"""
+
+    def __init__(self, calls, throttled=(), delay=0.01):
+        self.calls = calls
+        self.throttled = set(throttled)
+        self.delay = delay
+
+    def translate(self, text):
+        self.calls.append((time.monotonic(), text))
+        time.sleep(self.delay)
+        if text in self.throttled:
+            self.throttled.discard(text)
+            raise RateLimited(f"429 for {text}")
+        return text.upper()
+
+class TranslateChunksTest(unittest.TestCase):
+    def make_factory(self, calls, throttled=(), delay=0.01):
+        # One stub shared by every worker, so a chunk is throttled only once
+        translator = StubTranslator(calls, throttled, delay)
+        lock = threading.Lock()
+
+        def factory():
+            with lock:
+                return translator
+        return factory
+
+    def test_results_in_order_with_429_retries(self):
+        chunks = [f"chunk {i}" for i in range(12)]
+        calls = []
+        factory = self.make_factory(calls, throttled={'chunk 2', 'chunk 7'})
+        results = list(translate_chunks(chunks, factory, concurrency=4,
+                                        rate_limiter=TokenBucket(50, capacity=1),
+                                        backoff=0.2))
+
+        self.assertEqual([index for index, _, _ in results], list(range(12)))
+        self.assertEqual([translation for _, translation, _ in results],
+                         [chunk.upper() for chunk in chunks])
+        self.assertTrue(all(error is None for _, _, error in results))
+        # Each throttled chunk was sent twice
+        self.assertEqual(len(calls), 14)
+
+    def test_requests_are_paced_and_429_backs_everyone_off(self):
+        chunks = [f"chunk {i}" for i in range(10)]
+        calls = []
+        factory = self.make_factory(calls, throttled={'chunk 3'}, delay=0)
+        list(translate_chunks(chunks, factory, concurrency=4,
+                              rate_limiter=TokenBucket(20, capacity=1), backoff=0.5))
+
+        starts = sorted(started for started, _ in calls)
+        gaps = [later - earlier for earlier, later in zip(starts, starts[1:])]
+        # 20 requests per second with no burst: never much closer than 50 ms
+        self.assertGreaterEqual(min(gaps), 0.04)
+        # The 429 penalizes the shared bucket, holding back every worker
+        throttled_at = next(started for started, text in calls if text == 'chunk 3')
+        after = [started for started in starts if started > throttled_at]
+        self.assertGreaterEqual(after[0] - throttled_at, 0.45)
+
+    def test_failures_are_reported_in_place_without_retries(self):
+        attempts = []
+
+        class Failing:
+            def translate(self, text):
+                if text == 'bad':
+                    attempts.append(text)
+                    raise ValueError("broken")
+                return text
+
+        results = list(translate_chunks(['a', 'bad', 'c'], Failing, concurrency=2,
+                                        max_retries=1, backoff=0.01))
+        self.assertEqual([(index, translation) for index, translation, _ in results],
+                         [(0, 'a'), (1, None), (2, 'c')])
+        self.assertIsInstance(results[1][2], ValueError)
+        # Only rate limiting is retried
+        self.assertEqual(len(attempts), 1)
+
+    def test_stopping_early_cancels_queued_chunks(self):
+        chunks = [f"chunk {i}" for i in range(100)]
+        calls = []
+        results = translate_chunks(chunks, self.make_factory(calls, delay=0.05), concurrency=2)
+        self.assertEqual(next(results), (0, 'CHUNK 0', None))
+        results.close()
+        # Only the chunks already submitted ahead of the consumer were sent
+        self.assertLessEqual(len(calls), 6)
+
+class TranslateSegmentsTest(unittest.TestCase):
+    class Batching:
+        """Upper-cases each line; throttles the first throttle requests, then drops a line if asked"""
+
+        def __init__(self, throttle=0, drop_line=False):
+            self.requests = []
+            self.throttle = throttle
+            self.drop_line = drop_line
+
+        def translate(self, text):
+            self.requests.append(text)
+            if self.throttle:
+                self.throttle -= 1
+                raise RateLimited("429")
+            lines = text.upper().split('\n')
+            if self.drop_line and len(lines) > 1:
+                lines = lines[1:]
+            return '\n'.join(lines)
+
+    def translate(self, translator, texts, **options):
+        results = sorted(translate_segments(translator, texts, backoff=0.01, **options))
+        return [translation for _, translation, _ in results], [error for _, _, error in results]
+
+    def test_429_retries_the_same_batch(self):
+        texts = [f"title {i}" for i in range(8)]
+        translator = self.Batching(throttle=2)
+        translations, errors = self.translate(translator, texts)
+
+        self.assertEqual(translations, [text.upper() for text in texts])
+        self.assertEqual(errors, [None] * 8)
+        # Two throttled attempts and one success, all for the whole batch
+        self.assertEqual(len(translator.requests), 3)
+        self.assertEqual(len(set(translator.requests)), 1)
+
+    def test_429_past_max_retries_fails_the_batch_without_bisecting(self):
+        texts = [f"title {i}" for i in range(8)]
+        translator = self.Batching(throttle=10)
+        translations, errors = self.translate(translator, texts, max_retries=2)
+
+        self.assertEqual(translations, [None] * 8)
+        self.assertTrue(all(isinstance(error, RateLimited) for error in errors))
+        self.assertEqual(len(translator.requests), 3)
+
+    def test_line_count_mismatch_bisects(self):
+        texts = [f"title {i}" for i in range(4)]
+        translator = self.Batching(drop_line=True)
+        translations, errors = self.translate(translator, texts)
+
+        self.assertEqual(translations, [text.upper() for text in texts])
+        self.assertEqual(errors, [None] * 4)
+
+    def test_bad_segment_fails_only_itself(self):
+        class Rejecting(self.Batching):
+            def translate(self, text):
+                if 'bad' in text:
+                    self.requests.append(text)
+                    raise ValueError("rejected")
+                return super().translate(text)
+
+        texts = ['title 0', 'title 1', 'bad title', 'title 3', 'title 4']
+        translator = Rejecting()
+        translations, errors = self.translate(translator, texts)
+
+        self.assertEqual(translations, ['TITLE 0', 'TITLE 1', None, 'TITLE 3', 'TITLE 4'])
+        self.assertIsInstance(errors[2], ValueError)
+        self.assertEqual([error for i, error in enumerate(errors) if i != 2], [None] * 4)
+        # The shared request, then one per segment
+        self.assertEqual(len(translator.requests), 6)
+
+if __name__ == '__main__':
+    unittest.main()
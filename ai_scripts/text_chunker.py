@@ -0,0 +1,155 @@
+import re
+from dataclasses import dataclass
+from typing import IO, Iterator, List, Tuple
+
+from disk_cache import cache_key
+
+# deep_translator rejects requests over 5000 characters
+DEFAULT_MAX_CHARS = 4800
+
+# Split levels, coarsest first: paragraphs, sentences, words
+_SPLIT_PATTERNS = [
+    re.compile(r'\n[^\S\n]*\n\s*'),
+    re.compile(r'(?:(?<=[.!?])|(?<=[.!?]["\'”’)\]]))\s+'),
+    re.compile(r'\s+'),
+]
+_PARAGRAPH_BREAK = _SPLIT_PATTERNS[0]
+_SENTENCE_BREAK = _SPLIT_PATTERNS[1]
+_WHITESPACE = _SPLIT_PATTERNS[2]
+
+@dataclass(frozen=True)
+class Chunk:
+    text: str       # source text, starting and ending on non-whitespace
+    start: int      # offset of text in the source
+    end: int
+    separator: str  # whitespace between this chunk and the next one
+
+    @property
+    def id(self) -> str:
+        """Stable id derived from the content, so it survives edits elsewhere in the text"""
+        return cache_key(self.text)[:16]
+
+def _spans(text: str, start: int, end: int, pattern) -> Iterator[Tuple[int, int]]:
+    """Non-empty spans of text[start:end] between matches of pattern, trimmed of whitespace"""
+    position = start
+    for match in pattern.finditer(text, start, end):
+        yield from _trimmed(text, position, match.start())
+        position = match.end()
+    yield from _trimmed(text, position, end)
+
+def _trimmed(text: str, start: int, end: int) -> Iterator[Tuple[int, int]]:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    if start < end:
+        yield start, end
+
+def _units(text: str, start: int, end: int, max_chars: int, level: int = 0) -> Iterator[Tuple[int, int]]:
+    """Spans no longer than max_chars, splitting only as finely as needed"""
+    for span_start, span_end in _spans(text, start, end, _SPLIT_PATTERNS[level]):
+        if span_end - span_start <= max_chars:
+            yield span_start, span_end
+        elif level + 1 < len(_SPLIT_PATTERNS):
+            yield from _units(text, span_start, span_end, max_chars, level + 1)
+        else:
+            # A single "word" over the limit: hard cut it
+            for cut in range(span_start, span_end, max_chars):
+                yield cut, min(cut + max_chars, span_end)
+
+def _pack(text: str, start: int, end: int, max_chars: int) -> Iterator[Tuple[int, int]]:
+    """Greedily pack consecutive units into spans of at most max_chars"""
+    chunk_start = chunk_end = None
+    for unit_start, unit_end in _units(text, start, end, max_chars):
+        if chunk_start is None:
+            chunk_start, chunk_end = unit_start, unit_end
+        elif unit_end - chunk_start <= max_chars:
+            chunk_end = unit_end
+        else:
+            yield chunk_start, chunk_end
+            chunk_start, chunk_end = unit_start, unit_end
+    if chunk_start is not None:
+        yield chunk_start, chunk_end
+
+def iter_chunks(text: str, max_chars: int = DEFAULT_MAX_CHARS, start: int = 0,
+                end: int = None) -> Iterator[Chunk]:
+    """
+    Split text[start:end] into chunks of whole paragraphs, packed greedily up to max_chars.
+
+    Paragraphs that don't fit are split into sentences, sentences into words.
+    Joining each chunk's text and separator reproduces the text without its
+    leading whitespace. Offsets are into text, which is never sliced except
+    for the chunks themselves.
+    """
+    if end is None:
+        end = len(text)
+    spans = list(_pack(text, start, end, max_chars))
+    for i, (chunk_start, chunk_end) in enumerate(spans):
+        next_start = spans[i + 1][0] if i + 1 < len(spans) else end
+        yield Chunk(text[chunk_start:chunk_end], chunk_start, chunk_end, text[chunk_end:next_start])
+
+def iter_file_chunks(file: IO[str], max_chars: int = DEFAULT_MAX_CHARS,
+                     block_size: int = 1 << 16) -> Iterator[Chunk]:
+    """
+    Streaming version of iter_chunks for an open text file.
+
+    Only complete paragraphs are packed; the last chunk of each block is carried
+    over and re-packed with the next block, so the result is the same as for
+    the whole text while memory stays around block_size + max_chars.
+    """
+    buffer = ''
+    offset = 0  # position of buffer[0] in the file
+    pending = None
+    eof = False
+    while not eof:
+        block = file.read(block_size)
+        eof = not block
+        buffer += block
+
+        if eof:
+            limit = len(buffer)
+        else:
+            # Pack up to the last paragraph break, or the last whitespace if a
+            # paragraph is getting too long to hold
+            breaks = list(_PARAGRAPH_BREAK.finditer(buffer))
+            if breaks:
+                limit = breaks[-1].start()
+            elif len(buffer) > 4 * max_chars:
+                gaps = list(_WHITESPACE.finditer(buffer, len(buffer) - max_chars))
+                limit = gaps[-1].start() if gaps else len(buffer)
+            else:
+                continue
+
+        spans = list(_pack(buffer, 0, limit, max_chars))
+        if not eof and spans:
+            # The last chunk may still grow with the next block
+            spans, carry = spans[:-1], spans[-1][0]
+        else:
+            carry = limit
+
+        for start, end in spans:
+            if pending is not None:
+                yield Chunk(pending[0], pending[1], pending[2], buffer[pending[2] - offset:start])
+            pending = (buffer[start:end], start + offset, end + offset)
+
+        if pending is not None and pending[2] - offset < carry:
+            # Keep the whitespace after the pending chunk for its separator
+            carry = pending[2] - offset
+        buffer = buffer[carry:]
+        offset += carry
+
+    if pending is not None:
+        yield Chunk(pending[0], pending[1], pending[2], buffer[pending[2] - offset:])
+
+def split_paragraphs(text: str) -> List[str]:
+    """Paragraphs of text with their line wraps undone"""
+    paragraphs = (' '.join(paragraph.split()) for paragraph in _PARAGRAPH_BREAK.split(text))
+    return [paragraph for paragraph in paragraphs if paragraph]
+
+def split_sentences(text: str) -> List[str]:
+    """Sentences of a single paragraph or line"""
+    return [text[start:end] for start, end in _spans(text, 0, len(text), _SENTENCE_BREAK)]
+
+def chunk_text(text: str, max_chars: int = DEFAULT_MAX_CHARS, start: int = 0,
+               end: int = None) -> List[Chunk]:
+    return list(iter_chunks(text, max_chars, start, end))
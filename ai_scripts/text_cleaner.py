@@ -1,4 +1,80 @@
+import json
 import re
+import tempfile
+
+from running_headers import RunningHeaderDetector
+
+# Each cleaning step matches exactly what its original one-line regex matched,
+# but in linear time: lookbehinds keep a match from starting inside a run of
+# capitals, digits or whitespace, and every run is followed by something it
+# can't match, so giving characters back never helps and is abandoned at once.
+
+# 1. Hyphen, line break, rest of the word
+_LINE_HYPHEN = re.compile(r'-(?=[^\S\n]*\n)\s*([a-zA-Z])')
+# 2. Hyphen followed by a running header (isolated letter, page number, title)
+_HEADER_HYPHEN = re.compile(r'-\s*[A-Z]\s*\d+')
+_CAPS_RUN = re.compile(r'[A-Z\s]*')
+# The main title: first run of capitals after a number
+_TITLE = re.compile(r'(?<!\d)\d+(\s[A-Z\s][A-Z\s]+)')
+# 3. Page numbers and titles that interrupt sentences
+_PAGE_HEADER = re.compile(r'(?<!\d)\d+\s[A-Z\s]+')
+# 4. Isolated single letters
+_ISOLATED_LETTER = re.compile(r'(?<!\s)\s+[A-Z]\s+')
+# 8. Paragraph breaks after sentence ends
+_SENTENCE_END = re.compile(r'(?<=[.!?]) ')
+
+# While streaming, text is only cut right after a character that no match of
+# the step can run past, so each piece is cleaned exactly as in the whole text.
+# These match up to the last such character.
+_LINE_HYPHEN_CUT = re.compile(r'(?s).*[^\s\-]')
+_HEADER_HYPHEN_CUT = re.compile(r'(?s).*[^\s\-A-Z\d]')
+_PAGE_HEADER_CUT = re.compile(r'(?s).*[^\sA-Z\d]')
+_ISOLATED_LETTER_CUT = re.compile(r'(?s).*[^\sA-Z]')
+
+def _join_line_hyphens(text):
+    return _LINE_HYPHEN.sub(r'\1', text)
+
+def _join_header_hyphens(text):
+    """The hyphen and the header go; the letter after them joins the word"""
+    parts = []
+    position = search_from = 0
+    while True:
+        match = _HEADER_HYPHEN.search(text, search_from)
+        if not match:
+            break
+        run_end = _CAPS_RUN.match(text, match.end()).end()
+        letter = None
+        if match.end() < run_end < len(text) and 'a' <= text[run_end] <= 'z':
+            letter = run_end
+        else:
+            # The word resumes at the last capital of the run, unless that is
+            # the run's first character
+            for i in range(run_end - 1, match.end(), -1):
+                if 'A' <= text[i] <= 'Z':
+                    letter = i
+                    break
+        if letter is None:
+            search_from = match.start() + 1
+            continue
+        parts.append(text[position:match.start()])
+        parts.append(text[letter])
+        position = search_from = letter + 1
+    parts.append(text[position:])
+    return ''.join(parts)
+
+def _remove_page_headers(text):
+    """Replace page headers, and the whitespace before them, with a space"""
+    parts = []
+    position = 0
+    for match in _PAGE_HEADER.finditer(text):
+        parts.append(text[position:match.start()].rstrip())
+        parts.append(' ')
+        position = match.end()
+    parts.append(text[position:])
+    return ''.join(parts)
+
+def _remove_isolated_letters(text):
+    return _ISOLATED_LETTER.sub(' ', text)
 
 def join_hyphenated_words(text):
     """
@@ -6,70 +82,225 @@ def join_hyphenated_words(text):
     and titles that appear in between.
     """
     # First, join all lines into a single string while preserving important breaks
-    text = re.sub(r'-\s*\n\s*([a-zA-Z])', r'\1', text)
+    text = _join_line_hyphens(text)
     
     # Remove isolated letters and page numbers with titles between hyphenated words
-    text = re.sub(r'-\s*[A-Z]\s*\d+\s*[A-Z\s]+\s*([a-zA-Z])', r'\1', text)
+    text = _join_header_hyphens(text)
     
     return text
 
-def clean_text(input_file, output_file):
+def _stream(pieces, transform, cut):
+    """Apply transform to a stream of text, cutting it only where cut allows"""
+    buffer = ''
+    for piece in pieces:
+        buffer += piece
+        match = cut.match(buffer)
+        if match:
+            yield transform(buffer[:match.end()])
+            buffer = buffer[match.end():]
+    if buffer:
+        yield transform(buffer)
+
+def _normalize_spaces(pieces):
+    """' '.join(text.split()) over a stream"""
+    started = False
+    gap = False  # whitespace since the last word
+    for piece in pieces:
+        words = piece.split()
+        if not words:
+            gap = gap or bool(piece)
+            continue
+        text = ' '.join(words)
+        if started and (gap or piece[0].isspace()):
+            text = ' ' + text
+        yield text
+        started = True
+        gap = piece[-1].isspace()
+
+def _space_quotations(pieces, quotes):
     """
-    Cleans and reorganizes text from OCR output, handling hyphenated words,
-    page numbers, and maintaining proper spacing.
+    Give each quotation one space on either side and none inside its opening
+    mark, over the space-normalized stream.
+
+    quotes is the number of quotation marks in the text: a mark only opens a
+    quotation if another one follows it and the quotation isn't empty, so this
+    needs no more than two characters of lookahead.
     """
-    try:
-        # Read the input file
-        print(f"Reading file: {input_file}")
-        with open(input_file, 'r', encoding='utf-8') as file:
-            text = file.read()
-        
-        # Initial cleaning steps
-        
-        # 1. Handle hyphenated words first
-        text = join_hyphenated_words(text)
-        
-        # 2. Extract the main title if it exists
-        title_match = re.search(r'\d+\s+([A-Z\s]+(?:[A-Z\s]+))', text)
-        main_title = title_match.group(1).strip() if title_match else None
+    buffer = ''
+    last = ''  # last character written
+    in_quote = False
+    skip_space = False
+    pieces = iter(pieces)
+    eof = False
+    while not eof:
+        piece = next(pieces, None)
+        eof = piece is None
+        if not eof:
+            buffer += piece
+        out = []
+        position = 0
+        while True:
+            if skip_space and position < len(buffer):
+                if buffer[position] == ' ':
+                    position += 1
+                skip_space = False
+            mark = buffer.find('"', position)
+            if mark == -1 or (not in_quote and not eof and mark + 2 >= len(buffer)):
+                end = len(buffer) if mark == -1 else mark
+                out.append(buffer[position:end])
+                position = end
+                break
+            if mark > position:
+                out.append(buffer[position:mark])
+                last = buffer[mark - 1]
+            quotes -= 1
+            position = mark + 1
+            if in_quote:
+                # Closing mark: exactly one space after it
+                out.append('" ')
+                last = ' '
+                in_quote = False
+                skip_space = True
+                continue
+            after = buffer[mark + 1:mark + 3]
+            if after[:1] not in ('', '"') and quotes > 0:
+                out.append('"' if last == ' ' else ' "')
+                if after[:1] == ' ' and after[1:] != '"':
+                    position += 1
+                in_quote = True
+            else:
+                out.append('"')
+            last = '"'
+        buffer = buffer[position:]
+        text = ''.join(out)
+        if text:
+            last = text[-1]
+            yield text
+
+def _break_sentences(pieces):
+    """A paragraph break (one newline) after every sentence end"""
+    last = ''
+    for piece in pieces:
+        text = _SENTENCE_END.sub('\n', piece)
+        if text[0] == ' ' and last in ('.', '!', '?'):
+            text = '\n' + text[1:]
+        last = piece[-1]
+        yield text
+
+def _read_blocks(file, size=1 << 16):
+    """Whole lines of file, about size characters at a time"""
+    for lines in iter(lambda: file.readlines(size), []):
+        yield ''.join(lines)
+
+def _count_quotes(input_file):
+    with open(input_file, 'r', encoding='utf-8') as file:
+        return sum(block.count('"') for block in _read_blocks(file))
+
+def _clean_pieces(pieces, quotes, title=None):
+    """
+    The cleaning steps over a stream of text.
+
+    With title (a list, which receives the main title if one is found) the
+    running headers are removed with the step 2 and 3 regexes; without it
+    they are assumed to be gone already and those steps are skipped.
+    """
+    # 1. Handle hyphenated words first
+    pieces = _stream(pieces, _join_line_hyphens, _LINE_HYPHEN_CUT)
+    if title is not None:
+        def find_title(text):
+            # 2. Extract the main title if it exists
+            if not title:
+                title_match = _TITLE.search(text)
+                if title_match:
+                    title.append(title_match.group(1).strip())
+            return _remove_page_headers(text)
         
+        pieces = _stream(pieces, _join_header_hyphens, _HEADER_HYPHEN_CUT)
         # 3. Remove page numbers and titles that interrupt sentences
-        text = re.sub(r'\s*\d+\s+[A-Z\s]+\s*', ' ', text)
-        
-        # 4. Remove isolated single letters
-        text = re.sub(r'\s+[A-Z]\s+', ' ', text)
-        
-        # 5. Normalize spaces
-        text = ' '.join(text.split())
-        
-        # 6. Fix quotation marks with proper spacing
-        text = re.sub(r'\s*"\s*([^"]+)\s*"\s*', r' "\1" ', text)
-        
-        # 7. Fix multiple spaces
-        text = re.sub(r'\s{2,}', ' ', text)
-        
-        # 8. Add proper paragraph breaks
-        text = re.sub(r'(?<=[.!?])\s+', '\n\n', text)
-        
-        # 9. Clean up any remaining artifacts
-        text = re.sub(r'\s*\n\s*', '\n', text)  # Clean line breaks
-        text = re.sub(r'\n{3,}', '\n\n', text)  # Normalize paragraph spacing
+        pieces = _stream(pieces, find_title, _PAGE_HEADER_CUT)
+    # 4. Remove isolated single letters
+    pieces = _stream(pieces, _remove_isolated_letters, _ISOLATED_LETTER_CUT)
+    # 5. Normalize spaces
+    pieces = _normalize_spaces(pieces)
+    # 6-7. Fix quotation marks with proper spacing
+    pieces = _space_quotations(pieces, quotes)
+    # 8-9. Add proper paragraph breaks
+    return _break_sentences(pieces)
+
+def _save_cleaned(pieces, output_file, get_title):
+    """
+    Write the cleaned text, with the main title at the top if get_title()
+    finds one once the text is done, and show a preview.
+    """
+    preview = ''
+    # The body is spooled since the title is only known at the end
+    with tempfile.SpooledTemporaryFile(max_size=1 << 22, mode='w+', encoding='utf-8') as body:
+        for text in pieces:
+            body.write(text)
+            if len(preview) < 500:
+                preview += text[:500 - len(preview)]
         
-        # Save cleaned text
         print(f"Saving cleaned text to: {output_file}")
+        main_title = get_title()
         with open(output_file, 'w', encoding='utf-8') as file:
             # Add the main title at the top if found
             if main_title:
                 file.write(f"{main_title}\n\n")
-            file.write(text)
-            
-        print("Text cleaning completed successfully!")
+            body.seek(0)
+            for block in iter(lambda: body.read(1 << 16), ''):
+                file.write(block)
+    
+    print("Text cleaning completed successfully!")
+    
+    # Show a preview
+    print("\nSample of cleaned text:")
+    print("-" * 50)
+    print(preview)
+    print("-" * 50)
+
+def clean_text(input_file, output_file):
+    """
+    Cleans and reorganizes text from OCR output, handling hyphenated words,
+    page numbers, and maintaining proper spacing.
+
+    The file is streamed a block of lines at a time through the cleaning steps,
+    so memory stays constant whatever the size of the book; the result is the
+    same as cleaning the whole text at once.
+    """
+    try:
+        print(f"Reading file: {input_file}")
+        # Quotation marks are counted first; no step adds or removes them
+        quotes = _count_quotes(input_file)
+        title = []
+        with open(input_file, 'r', encoding='utf-8') as file:
+            pieces = _clean_pieces(_read_blocks(file), quotes, title)
+            _save_cleaned(pieces, output_file, lambda: title[0] if title else None)
         
-        # Show a preview
-        print("\nSample of cleaned text:")
-        print("-" * 50)
-        print(text[:500])
-        print("-" * 50)
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
+
+def clean_pages(input_file, output_file, depth=2, min_pages=3):
+    """
+    Cleans the pages of a PDF OCR result, as saved by AdvancedOCR.process_file.
+
+    Running headers, footers and page numbers are found from how often each
+    line repeats at the top and bottom of pages (see running_headers) and
+    dropped before the text is joined, so the header regexes of clean_text
+    are not needed and capitals in the text are left alone. The most frequent
+    header becomes the title. Pages are read from raw_text, which keeps the
+    line breaks that corrected_text has lost.
+    """
+    try:
+        print(f"Reading OCR pages: {input_file}")
+        with open(input_file, 'r', encoding='utf-8') as file:
+            pages = [page['raw_text'] for page in json.load(file).get('pages', []) if 'raw_text' in page]
+        
+        detector = RunningHeaderDetector(depth, min_pages).fit(pages)
+        pages = [detector.strip_page(text, page) + '\n' for page, text in enumerate(pages)]
+        print(f"Removed running headers from {len(pages)} pages")
+        
+        pieces = _clean_pieces(pages, sum(text.count('"') for text in pages))
+        _save_cleaned(pieces, output_file, detector.title)
         
     except Exception as e:
         print(f"An error occurred: {str(e)}")
@@ -82,10 +313,10 @@ def test_cleaning(text):
     text = join_hyphenated_words(text)
     
     # Remove page numbers and titles
-    text = re.sub(r'\s*\d+\s+[A-Z\s]+\s*', ' ', text)
+    text = _remove_page_headers(text)
     
     # Remove isolated letters
-    text = re.sub(r'\s+[A-Z]\s+', ' ', text)
+    text = _remove_isolated_letters(text)
     
     # Normalize spaces
     text = ' '.join(text.split())
@@ -98,8 +329,9 @@ def main():
         print("1. Clean a file")
         print("2. Test a single line")
         print("3. Quit")
+        print("4. Clean OCR pages (JSON from advanced_ocr)")
         
-        choice = input("Enter your choice (1-3): ")
+        choice = input("Enter your choice (1-4): ")
         
         if choice == '1':
             input_file = input("Enter the path to your text file: ")
@@ -123,6 +355,17 @@ def main():
         elif choice == '3':
             break
         
+        elif choice == '4':
+            input_file = input("Enter the path to the OCR JSON file: ")
+            
+            if not os.path.exists(input_file):
+                print("File not found. Please check the path and try again.")
+                continue
+            
+            file_name = os.path.splitext(input_file)[0]
+            output_file = f"{file_name}_cleaned.txt"
+            clean_pages(input_file, output_file)
+            
         else:
             print("Invalid choice. Please try again.")
 
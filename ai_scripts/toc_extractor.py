@@ -1,5 +1,7 @@
+import io
 import re
-from typing import List, Dict, Tuple
+from collections import deque
+from typing import Iterable, List, Dict, Tuple
 from dataclasses import dataclass
 
 @dataclass
@@ -10,7 +12,25 @@ class TOCEntry:
     number: str = ""  # Store I, II, III, etc.
 
 class TOCExtractor:
-    def __init__(self):
+    # Compiled once; extract_toc runs them on every line of the TOC
+    TOC_START = re.compile(r'(?:CONTENTS|Table of Contents|Contents)', re.IGNORECASE)
+    SEPARATOR = re.compile(r'[-—_=]+$')
+    ROMAN_PREFIX = re.compile(r'([IVXLCDM]+)\.?\s+')
+    DECIMAL_PREFIX = re.compile(r'(\d+)\.?\s+')
+    PAGE_NUMBER = re.compile(r'(\d+)\s*$')
+    # Starts only at the beginning of a separator run, so long dot leaders stay linear
+    PAGE_SUFFIX = re.compile(r'(?<![.—_\s])[.—_\s]+\d+\s*$')
+    SPACES = re.compile(r'\s+')
+    TRAILING_DOTS = re.compile(r'\s*\.+\s*$')
+    LEADING_ROMAN = re.compile(r'^[IVXLCDM]+\.\s*')
+
+    def __init__(self, window: int = 8, min_density: float = 0.25):
+        """
+        The TOC ends once fewer than min_density of its last window lines
+        carry a page number.
+        """
+        self.window = window
+        self.min_density = min_density
         self.roman_numerals = {
             'I': 1, 'II': 2, 'III': 3, 'IV': 4, 'V': 5,
             'VI': 6, 'VII': 7, 'VIII': 8, 'IX': 9, 'X': 10,
@@ -28,23 +48,23 @@ class TOCExtractor:
     def clean_title(self, title: str) -> str:
         """Clean and normalize title text."""
         # Remove multiple spaces
-        title = re.sub(r'\s+', ' ', title)
+        title = self.SPACES.sub(' ', title)
         # Remove dots used for spacing
-        title = re.sub(r'\s*\.+\s*$', '', title)
+        title = self.TRAILING_DOTS.sub('', title)
         # Remove leading/trailing spaces
         title = title.strip()
         # Remove leading roman numerals and dots
-        title = re.sub(r'^[IVXLCDM]+\.\s*', '', title)
+        title = self.LEADING_ROMAN.sub('', title)
         return title
 
     def extract_page_number(self, line: str) -> Tuple[str, int]:
         """Extract page number and clean the line."""
         # Look for numbers at the end of the line
-        page_match = re.search(r'.*?(\d+)\s*$', line.strip())
+        page_match = self.PAGE_NUMBER.search(line.strip())
         if page_match:
             page_num = int(page_match.group(1))
             # Remove everything after the last letter until the number
-            title = re.sub(r'\s*[.—_\s]+\d+\s*$', '', line)
+            title = self.PAGE_SUFFIX.sub('', line)
             return title.strip(), page_num
         return line.strip(), -1
 
@@ -58,14 +78,14 @@ class TOCExtractor:
         line = line.strip()
         
         # Check for Roman numerals at start
-        roman_match = re.match(r'^([IVXLCDM]+)\.?\s+', line)
+        roman_match = self.ROMAN_PREFIX.match(line)
         if roman_match:
             number = roman_match.group(1)
             rest = line[roman_match.end():].strip()
             return number, rest
             
         # Check for decimal numbers
-        decimal_match = re.match(r'^(\d+)\.?\s+', line)
+        decimal_match = self.DECIMAL_PREFIX.match(line)
         if decimal_match:
             number = decimal_match.group(1)
             rest = line[decimal_match.end():].strip()
@@ -75,10 +95,19 @@ class TOCExtractor:
 
     def extract_toc(self, text: str) -> List[TOCEntry]:
         """Extract table of contents entries from text."""
-        lines = text.split('\n')
+        return self.extract_toc_lines(io.StringIO(text))
+
+    def extract_toc_lines(self, lines: Iterable[str]) -> List[TOCEntry]:
+        """
+        Extract table of contents entries from lines, e.g. an open file.
+
+        Lines are only parsed between a "CONTENTS" heading and the point where
+        page-numbered lines thin out (see __init__); reading stops there, so
+        the cost depends on the size of the TOC rather than of the book.
+        """
         toc_entries = []
         in_toc_section = False
-        previous_level = 0
+        recent = deque(maxlen=self.window)  # whether each recent TOC line had a page number
         
         for line in lines:
             line = line.strip()
@@ -88,19 +117,28 @@ class TOCExtractor:
                 continue
                 
             # Detect start of TOC
-            if re.match(r'^(?:CONTENTS|Table of Contents|Contents)', line, re.IGNORECASE):
+            if self.TOC_START.match(line):
                 in_toc_section = True
                 continue
                 
             if in_toc_section:
                 # Skip lines that look like headers or separators
-                if re.match(r'^[-—_=]+$', line) or line.count('.') > 10:
+                if self.SEPARATOR.match(line) or line.count('.') > 10:
                     continue
                     
                 # Extract and clean the line
                 number, content = self.extract_section_number(line)
                 title, page = self.extract_page_number(content)
                 
+                recent.append(page >= 0)
+                if len(recent) == self.window and sum(recent) < self.min_density * self.window:
+                    if toc_entries:
+                        break
+                    # A "Contents" line that wasn't followed by a TOC
+                    in_toc_section = False
+                    recent.clear()
+                    continue
+                
                 # Skip if we don't have enough information
                 if not title or page < 0:
                     continue
@@ -150,13 +188,10 @@ class TOCExtractor:
 def process_file(input_file: str, output_file: str):
     """Process a file and extract its table of contents."""
     try:
-        # Read input file
-        with open(input_file, 'r', encoding='utf-8') as f:
-            text = f.read()
-        
-        # Extract TOC
+        # Extract TOC, reading the input file only as far as the TOC goes
         extractor = TOCExtractor()
-        toc_entries = extractor.extract_toc(text)
+        with open(input_file, 'r', encoding='utf-8') as f:
+            toc_entries = extractor.extract_toc_lines(f)
         
         # Format and save TOC
         formatted_toc = extractor.format_toc(toc_entries)
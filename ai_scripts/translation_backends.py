@@ -0,0 +1,138 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+
+from deep_translator import GoogleTranslator
+from text_chunker import split_sentences
+
+class TranslationBackend(ABC):
+    """
+    A translation engine. translate(text) must keep the line structure of text,
+    since batched requests are split back apart on newlines.
+    """
+
+    name = 'base'
+    # Remote backends are rate limited; local ones are loaded once and shared
+    remote = True
+
+    def __init__(self, source='auto', target='ar'):
+        self.source = source
+        self.target = target
+
+    @property
+    def cache_name(self):
+        """Identifies this backend's output in the translation cache"""
+        return self.name
+
+    @abstractmethod
+    def translate(self, text, **kwargs):
+        """Translation of text, with its lines kept apart"""
+
+    def translate_batch(self, texts):
+        return [self.translate(text) for text in texts]
+
+class GoogleBackend(TranslationBackend):
+    """Google Translate through its free web endpoint (deep_translator)"""
+
+    name = 'google'
+
+    def __init__(self, source='auto', target='ar'):
+        super().__init__(source, target)
+        self._translator = GoogleTranslator(source=source, target=target)
+
+    def translate(self, text, **kwargs):
+        return self._translator.translate(text)
+
+class CTranslate2Backend(TranslationBackend):
+    """
+    Local CPU model run with CTranslate2, e.g. an OPUS-MT Marian model converted with
+    `ct2-transformers-converter --model Helsinki-NLP/opus-mt-en-ar --output_dir opus-mt-en-ar`.
+
+    The model is loaded once; each call translates all the sentences of its text
+    as one batch, so throughput depends only on the CPU. The CTranslate2 model is
+    thread-safe, the Hugging Face tokenizer is not, so each thread gets its own.
+    Requires the optional ctranslate2, transformers and sentencepiece packages.
+    """
+
+    name = 'ctranslate2'
+    remote = False
+
+    def __init__(self, source='en', target='ar', model_dir=None, tokenizer=None,
+                 device='cpu', inter_threads=1, intra_threads=0, batch_size=32, beam_size=2):
+        super().__init__(source, target)
+        try:
+            import ctranslate2
+            import transformers
+        except ImportError as e:
+            raise ImportError(
+                "The ctranslate2 backend needs: pip install ctranslate2 transformers sentencepiece"
+            ) from e
+
+        if model_dir is None:
+            model_dir = os.environ.get('AI_SCRIPTS_CT2_MODEL', f"opus-mt-{source}-{target}")
+        if not os.path.isdir(model_dir):
+            raise FileNotFoundError(f"No CTranslate2 model at {model_dir}")
+
+        self.model_dir = model_dir
+        self.batch_size = batch_size
+        self.beam_size = beam_size
+        self._translator = ctranslate2.Translator(
+            model_dir, device=device, inter_threads=inter_threads, intra_threads=intra_threads
+        )
+        self._tokenizer_path = tokenizer or model_dir
+        self._local = threading.local()
+        # Load one now so a missing tokenizer fails here, not in a worker
+        self._local.tokenizer = transformers.AutoTokenizer.from_pretrained(self._tokenizer_path)
+
+    @property
+    def _tokenizer(self):
+        """This thread's tokenizer"""
+        tokenizer = getattr(self._local, 'tokenizer', None)
+        if tokenizer is None:
+            import transformers
+            tokenizer = self._local.tokenizer = transformers.AutoTokenizer.from_pretrained(self._tokenizer_path)
+        return tokenizer
+
+    @property
+    def cache_name(self):
+        return f"{self.name}:{os.path.basename(os.path.normpath(self.model_dir))}"
+
+    def translate_batch(self, texts):
+        tokenizer = self._tokenizer
+        tokens = [tokenizer.convert_ids_to_tokens(tokenizer.encode(text)) for text in texts]
+        results = self._translator.translate_batch(
+            tokens, max_batch_size=self.batch_size, beam_size=self.beam_size
+        )
+        return [
+            tokenizer.decode(
+                tokenizer.convert_tokens_to_ids(result.hypotheses[0]), skip_special_tokens=True
+            )
+            for result in results
+        ]
+
+    def translate(self, text, **kwargs):
+        # Marian models take one sentence at a time; translate every sentence
+        # of every line in one batch, then put the lines back together
+        lines = [split_sentences(line) for line in text.split('\n')]
+        sentences = [sentence for line in lines for sentence in line]
+        translated = iter(self.translate_batch(sentences)) if sentences else iter(())
+        return '\n'.join(' '.join(next(translated) for _ in line) for line in lines)
+
+BACKENDS = {
+    GoogleBackend.name: GoogleBackend,
+    CTranslate2Backend.name: CTranslate2Backend,
+}
+
+def get_backend_class(name):
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown translation backend {name!r}; choose from {', '.join(BACKENDS)}")
+
+def get_backend(name='google', source='auto', target='ar', **options):
+    """Build a translation backend by name"""
+    backend_class = get_backend_class(name)
+    if source == 'auto' and not backend_class.remote:
+        # Local models are trained for one language pair
+        source = 'en'
+    return backend_class(source=source, target=target, **options)
@@ -0,0 +1,153 @@
+import json
+import os
+import time
+
+from disk_cache import cache_key
+
+class TranslationJob:
+    """
+    Checkpoint for one translation run, so an interrupted run resumes where it stopped.
+
+    Two files sit next to the output:
+    - <output>.job.json: manifest with the status (pending/done/failed), offset and
+      length of every segment, rewritten atomically after each change
+    - <output>.parts: translated segments appended and fsync'd as they complete
+
+    Segments are identified by a hash of their source text, so identical segments
+    share one entry and a segment keeps its translation when others change.
+    settings (source and target language, backend and its options) are recorded in
+    the manifest; a checkpoint made with other settings is discarded, so resuming
+    never mixes in translations into another language or from another backend.
+    """
+
+    VERSION = 2
+
+    def __init__(self, output_file, texts, settings=None):
+        self.output_file = output_file
+        self.manifest_path = f"{output_file}.job.json"
+        self.parts_path = f"{output_file}.parts"
+        self.ids = [cache_key(text)[:16] for text in texts]
+        self.entries = {}
+        # Normalized the way it is stored, so it compares equal after a reload
+        self.settings = json.loads(json.dumps(settings or {}, sort_keys=True, default=str))
+        self.discarded = False
+
+        manifest = self._load_manifest()
+        if manifest is not None and manifest.get('settings') != self.settings:
+            # Another language, backend or manifest version: start over
+            manifest = None
+            self.discarded = True
+            if os.path.exists(self.parts_path):
+                os.remove(self.parts_path)
+        previous = manifest.get('segments', {}) if manifest else {}
+        parts_size = os.path.getsize(self.parts_path) if os.path.exists(self.parts_path) else 0
+        for segment_id in self.ids:
+            entry = previous.get(segment_id)
+            # A done entry is only trusted if its bytes made it into the parts file
+            if (entry and entry.get('status') == 'done'
+                    and entry['offset'] + entry['length'] <= parts_size):
+                self.entries[segment_id] = entry
+            elif entry and entry.get('status') == 'failed':
+                self.entries[segment_id] = {'status': 'failed', 'error': entry.get('error')}
+            else:
+                self.entries.setdefault(segment_id, {'status': 'pending'})
+        self._save_manifest()
+
+    def _load_manifest(self):
+        """The saved manifest, {} if it is from another version, None if there is none"""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get('version') != self.VERSION:
+            return {}
+        return manifest
+
+    def _save_manifest(self):
+        manifest = {
+            'version': self.VERSION,
+            'output': self.output_file,
+            'settings': self.settings,
+            'updated': time.time(),
+            'order': self.ids,
+            'segments': self.entries
+        }
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+    def _first_indices(self, statuses):
+        seen = set()
+        indices = []
+        for index, segment_id in enumerate(self.ids):
+            if segment_id in seen:
+                continue
+            seen.add(segment_id)
+            if self.entries[segment_id]['status'] in statuses:
+                indices.append(index)
+        return indices
+
+    def pending(self):
+        """Indices of segments still to translate (pending or failed), one per distinct text"""
+        return self._first_indices(('pending', 'failed'))
+
+    def failed(self):
+        return self._first_indices(('failed',))
+
+    @property
+    def complete(self):
+        return all(entry['status'] == 'done' for entry in self.entries.values())
+
+    def mark_done(self, index, translation):
+        data = translation.encode('utf-8')
+        with open(self.parts_path, 'ab') as f:
+            offset = f.seek(0, os.SEEK_END)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self.entries[self.ids[index]] = {'status': 'done', 'offset': offset, 'length': len(data)}
+        self._save_manifest()
+
+    def mark_failed(self, index, error):
+        self.entries[self.ids[index]] = {'status': 'failed', 'error': str(error)}
+        self._save_manifest()
+
+    def translation(self, index):
+        entry = self.entries[self.ids[index]]
+        if entry['status'] != 'done':
+            raise KeyError(f"Segment {index} is {entry['status']}")
+        with open(self.parts_path, 'rb') as f:
+            f.seek(entry['offset'])
+            return f.read(entry['length']).decode('utf-8')
+
+    def translations(self):
+        return [self.translation(index) for index in range(len(self.ids))]
+
+    def write_output(self, separator='\n'):
+        """
+        Assemble the translated segments in order into the output file.
+
+        separator goes between segments; pass a list to give each segment
+        the text that follows it instead.
+        """
+        tmp_path = f"{self.output_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for index in range(len(self.ids)):
+                if isinstance(separator, str):
+                    if index:
+                        f.write(separator)
+                    f.write(self.translation(index))
+                else:
+                    f.write(self.translation(index))
+                    f.write(separator[index])
+        os.replace(tmp_path, self.output_file)
+
+    def finish(self):
+        """Remove the checkpoint files once the output has been written"""
+        for path in (self.manifest_path, self.parts_path):
+            if os.path.exists(path):
+                os.remove(path)
@@ -1,65 +1,364 @@
-from deep_translator import GoogleTranslator
+from deep_translator.exceptions import TooManyRequests
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections import deque
+from disk_cache import CACHE_DIR, DiskCache, cache_key
+from text_chunker import DEFAULT_MAX_CHARS, iter_file_chunks, split_paragraphs
+from translation_backends import get_backend, get_backend_class
+from translation_job import TranslationJob
+import threading
 import time
 import os
 
-def translate_to_arabic(input_file, output_file):
+TRANSLATION_CACHE_PATH = os.path.join(CACHE_DIR, 'translations.sqlite')
+
+class TokenBucket:
+    """Thread-safe token bucket shared by every request made through it"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens=1):
+        """Block until tokens are available, then take them"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def penalize(self, seconds):
+        """Hold back every caller for the given time, e.g. after a 429"""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+class TranslationCache:
+    """On-disk translation memory keyed by hash(source text, source lang, target lang, backend)"""
+
+    def __init__(self, path=TRANSLATION_CACHE_PATH, max_bytes=256 * 1024 * 1024):
+        self.store = DiskCache(path, max_bytes=max_bytes)
+
+    @staticmethod
+    def key(text, source, target, backend):
+        return cache_key('translation', backend, source, target, text)
+
+    def get(self, text, source, target, backend):
+        return self.store.get(self.key(text, source, target, backend))
+
+    def put(self, text, source, target, backend, translation):
+        self.store.put(self.key(text, source, target, backend), translation, tag=backend)
+
+    def stats(self):
+        return self.store.stats()
+
+    def close(self):
+        self.store.close()
+
+def _request(translator, text, rate_limiter=None, max_retries=3, backoff=2.0):
+    """
+    One translate call. A 429 penalizes the shared bucket (or sleeps) and retries
+    the same text; any other error is raised.
+    """
+    delay = backoff
+    for attempt in range(max_retries + 1):
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        try:
+            return translator.translate(text)
+        except Exception as error:
+            if attempt == max_retries or not is_rate_limited(error):
+                raise
+            if rate_limiter is not None:
+                rate_limiter.penalize(delay)
+            else:
+                time.sleep(delay)
+            delay *= 2
+
+def _translate_lines(translator, lines, rate_limiter=None, max_retries=3, backoff=2.0):
+    """
+    Translate single lines joined into one newline-delimited request.
+
+    If the response does not split back into the same number of non-empty
+    lines, the batch is bisected until every line is accounted for. Errors
+    are not a reason to bisect: throttled requests are retried whole, and
+    anything else is raised.
+    """
+    if len(lines) == 1:
+        return [_request(translator, lines[0], rate_limiter, max_retries, backoff)]
+
+    response = _request(translator, '\n'.join(lines), rate_limiter, max_retries, backoff)
+    parts = [part.strip() for part in response.split('\n')] if response else []
+    if len(parts) == len(lines) and all(parts):
+        return parts
+
+    middle = len(lines) // 2
+    return (_translate_lines(translator, lines[:middle], rate_limiter, max_retries, backoff)
+            + _translate_lines(translator, lines[middle:], rate_limiter, max_retries, backoff))
+
+def translate_segments(translator, texts, cache=None, source='auto', target='ar', backend='google',
+                       rate_limiter=None, max_chars=DEFAULT_MAX_CHARS, short_chars=1000,
+                       max_lines=128, max_retries=3, backoff=2.0):
+    """
+    Translates texts, packing short ones (titles, headings, short paragraphs) into shared requests.
+
+    Each paragraph of a short text is unwrapped onto one line, and the lines of
+    many texts go out as one newline-delimited request of up to max_chars;
+    longer texts get a request each. Yields (index, translation, error) as
+    results become available, which is not necessarily in order. Texts found
+    in cache cost no request. A throttled request is retried whole, up to
+    max_retries times with exponential backoff; if a shared request fails for
+    any other reason, its texts are sent again one per request, so only the
+    bad one fails.
+    """
+    batch = []        # (index, number of paragraphs)
+    batch_lines = []
+    batch_chars = 0
+
+    def finish(index, lines):
+        translation = '\n\n'.join(lines)
+        if cache is not None:
+            cache.put(texts[index], source, target, backend, translation)
+        return index, translation, None
+
+    def flush():
+        try:
+            translated = _translate_lines(translator, batch_lines, rate_limiter, max_retries, backoff)
+        except Exception as error:
+            if len(batch) == 1 or is_rate_limited(error):
+                for index, _ in batch:
+                    yield index, None, error
+                return
+            # One bad segment shouldn't fail the rest: send each one on its own
+            translated = None
+        position = 0
+        for index, count in batch:
+            if translated is not None:
+                yield finish(index, translated[position:position + count])
+            else:
+                lines = batch_lines[position:position + count]
+                try:
+                    result = finish(index, _translate_lines(translator, lines, rate_limiter, max_retries, backoff))
+                except Exception as error:
+                    result = index, None, error
+                yield result
+            position += count
+
+    for index, text in enumerate(texts):
+        if cache is not None:
+            cached = cache.get(text, source, target, backend)
+            if cached is not None:
+                yield index, cached, None
+                continue
+
+        if len(text) > short_chars:
+            try:
+                translation = _request(translator, text, rate_limiter, max_retries, backoff)
+                if cache is not None:
+                    cache.put(text, source, target, backend, translation)
+                yield index, translation, None
+            except Exception as error:
+                yield index, None, error
+            continue
+
+        paragraphs = split_paragraphs(text)
+        if not paragraphs:
+            yield index, text, None
+            continue
+
+        size = sum(len(paragraph) + 1 for paragraph in paragraphs)
+        if batch and (batch_chars + size > max_chars or len(batch_lines) + len(paragraphs) > max_lines):
+            yield from flush()
+            batch, batch_lines, batch_chars = [], [], 0
+        batch.append((index, len(paragraphs)))
+        batch_lines.extend(paragraphs)
+        batch_chars += size
+
+    if batch:
+        yield from flush()
+
+def is_rate_limited(error):
+    """Whether an exception raised by a translator means we were throttled"""
+    return (isinstance(error, TooManyRequests)
+            or getattr(error, 'status_code', None) == 429)
+
+def translate_chunks(chunks, translator_factory, concurrency=4, rate_limiter=None,
+                     max_retries=3, backoff=2.0, cache=None, source='auto', target='ar',
+                     backend='google'):
+    """
+    Translates chunks on a thread pool and yields (index, translation, error) in order.
+
+    Each worker thread builds one translator with translator_factory and reuses it
+    for all its chunks. Every request, including retries, takes a token from
+    rate_limiter; a 429 penalizes the shared bucket so all workers back off together,
+    and is retried up to max_retries times. Any other error fails the chunk.
+    Chunks found in cache (a TranslationCache) never reach the pool; source, target
+    and backend only identify the translation in the cache. At most two chunks per
+    worker are submitted ahead of the consumer, and closing the generator early
+    cancels whatever has not started yet.
+    """
+    local = threading.local()
+
+    def translate(chunk):
+        if not chunk.strip():
+            return chunk
+        translator = getattr(local, 'translator', None)
+        if translator is None:
+            translator = local.translator = translator_factory()
+
+        translation = _request(translator, chunk, rate_limiter, max_retries, backoff)
+        if cache is not None and translation is not None:
+            cache.put(chunk, source, target, backend, translation)
+        return translation
+
+    def submit(chunk):
+        cached = cache.get(chunk, source, target, backend) if cache is not None else None
+        if cached is None:
+            return executor.submit(translate, chunk)
+        future = Future()
+        future.set_result(cached)
+        return future
+
+    def collect(index, future):
+        try:
+            return index, future.result(), None
+        except Exception as error:
+            return index, None, error
+
+    workers = max(1, concurrency)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    in_flight = deque()
+    index = 0
+    try:
+        for chunk in chunks:
+            in_flight.append(submit(chunk))
+            if len(in_flight) >= workers * 2:
+                yield collect(index, in_flight.popleft())
+                index += 1
+        while in_flight:
+            yield collect(index, in_flight.popleft())
+            index += 1
+    finally:
+        # Only reached early if the consumer stopped: drop the queued chunks
+        for future in in_flight:
+            future.cancel()
+        executor.shutdown()
+
+def translate_to_arabic(input_file, output_file, concurrency=4, requests_per_second=2.0,
+                        translator_factory=None, use_cache=True, max_chars=DEFAULT_MAX_CHARS,
+                        backend='google', backend_options=None):
     """
     Translates a text file to Arabic using free translation method and saves the result.
     
     Parameters:
     input_file (str): Path to the input text file
     output_file (str): Path where the translated text will be saved
+    concurrency (int): Number of chunks translated at the same time
+    requests_per_second (float): Rate limit shared by all workers
+    translator_factory (callable): Builds a translator with a translate(text=...) method
+        instead of backend; its output is never cached
+    use_cache (bool): Reuse translations of unchanged chunks from the on-disk translation memory
+    max_chars (int): Size budget of one request
+    backend (str): Translation backend, e.g. 'google' or 'ctranslate2' (see translation_backends)
+    backend_options (dict): Extra arguments for the backend, e.g. {'model_dir': ...}
+    
+    Progress is checkpointed next to output_file, so an interrupted run resumes where
+    it stopped and chunks that failed are retried. Returns True once the output is written.
     """
+    cache = None
+    cache_name = backend
+    rate_limited = True
+    if translator_factory is not None:
+        # A custom translator has no stable identity in the shared cache; the name
+        # only keeps its checkpoints apart from those of the real backends
+        cache_name = f"custom:{getattr(translator_factory, '__qualname__', type(translator_factory).__name__)}"
+    elif use_cache:
+        cache = TranslationCache()
+    
     try:
-        # Read the input file
+        if translator_factory is None:
+            options = backend_options or {}
+            if get_backend_class(backend).remote:
+                # One client per worker thread, e.g. Google Translator (free web version)
+                translator_factory = lambda: get_backend(backend, target='ar', **options)
+            else:
+                # Local models are loaded once and shared; they need no rate limit
+                shared = get_backend(backend, target='ar', **options)
+                translator_factory = lambda: shared
+                cache_name = shared.cache_name
+                rate_limited = False
+        
+        # Read the input file in chunks of whole paragraphs/sentences
+        # Each chunk should be less than 5000 characters
         print(f"Reading file: {input_file}")
         with open(input_file, 'r', encoding='utf-8') as file:
-            text = file.read()
+            text_chunks = list(iter_file_chunks(file, max_chars))
+        chunks = [chunk.text for chunk in text_chunks]
+        total_chunks = len(chunks)
         
-        # Split text into smaller chunks to avoid limitations
-        # Each chunk should be less than 5000 characters
-        chunk_size = 4000
-        chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+        # Pick up a previous run of the same output where it stopped
+        job = TranslationJob(output_file, chunks, {'source': 'auto', 'target': 'ar',
+                                                   'backend': cache_name,
+                                                   'options': backend_options})
+        if job.discarded:
+            print("Discarding the checkpoint of a run with another language or backend")
+        pending = job.pending()
+        if len(pending) < total_chunks:
+            print(f"Resuming: {total_chunks - len(pending)} of {total_chunks} chunks already translated")
         
-        # Translate each chunk
-        translated_chunks = []
-        total_chunks = len(chunks)
+        # Burst up to one request per worker, then hold the average rate
+        rate_limiter = None
+        if rate_limited:
+            rate_limiter = TokenBucket(requests_per_second, capacity=max(1, concurrency))
         
-        print("Starting translation...")
-        for i, chunk in enumerate(chunks, 1):
-            print(f"Translating chunk {i} of {total_chunks}...")
-            try:
-                # Using Google Translator (free web version)
-                translated = GoogleTranslator(source='auto', target='ar').translate(text=chunk)
-                translated_chunks.append(translated)
-                
-                # Add a small delay to avoid rate limiting
-                time.sleep(2)
-                
-            except Exception as chunk_error:
-                print(f"Error translating chunk {i}: {str(chunk_error)}")
-                print("Retrying after 5 seconds...")
-                time.sleep(5)
-                try:
-                    translated = GoogleTranslator(source='auto', target='ar').translate(text=chunk)
-                    translated_chunks.append(translated)
-                except:
-                    print(f"Failed to translate chunk {i}, skipping...")
-                    translated_chunks.append(chunk)
-            
-        # Combine translated chunks
-        complete_translation = '\n'.join(translated_chunks)
+        print(f"Starting translation with {concurrency} workers...")
+        results = translate_chunks([chunks[i] for i in pending], translator_factory,
+                                   concurrency, rate_limiter, cache=cache, target='ar',
+                                   backend=cache_name)
+        for n, translated, chunk_error in results:
+            i = pending[n]
+            if chunk_error is not None:
+                print(f"Failed to translate chunk {i + 1}: {str(chunk_error)}")
+                job.mark_failed(i, chunk_error)
+            else:
+                print(f"Translated chunk {i + 1} of {total_chunks}")
+                job.mark_done(i, translated)
+        
+        if cache is not None:
+            stats = cache.stats()
+            print(f"Translation cache: {stats['hits']} hits, {stats['misses']} misses")
         
-        # Save translated text
+        failed = job.failed()
+        if failed:
+            print(f"{len(failed)} chunks failed to translate; run again to retry them.")
+            print(f"Progress is kept in {job.manifest_path}")
+            return False
+        
+        # Combine translated chunks
         print(f"Saving translation to: {output_file}")
-        with open(output_file, 'w', encoding='utf-8') as file:
-            file.write(complete_translation)
-            
+        job.write_output([chunk.separator for chunk in text_chunks])
+        job.finish()
+        
         print("Translation completed successfully!")
         print(f"Translated file saved as: {output_file}")
-        
+        return True
+    
     except Exception as e:
         print(f"An error occurred: {str(e)}")
+        return False
+    finally:
+        if cache is not None:
+            cache.close()
 
 def main():
     while True:
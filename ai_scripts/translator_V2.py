@@ -1,17 +1,60 @@
-from deep_translator import GoogleTranslator
-import re
+from translation_backends import BACKENDS, TranslationBackend, get_backend, get_backend_class
+from translator import TokenBucket, TranslationCache, translate_segments
+from text_chunker import DEFAULT_MAX_CHARS, chunk_text
+from chapter_index import segment_chapters
+from translation_job import TranslationJob
+from disk_cache import cache_key
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import glob
 import os
+import sys
 import time
 
-def translate_local_book(file_path, target_lang='fr'):
+class RequestCounter:
+    """Wraps a translator and counts the requests and characters sent through it"""
+
+    def __init__(self, translator):
+        self.translator = translator
+        self.requests = 0
+        self.chars = 0
+
+    def translate(self, text, **kwargs):
+        self.requests += 1
+        self.chars += len(text)
+        return self.translator.translate(text, **kwargs)
+
+def translate_local_book(file_path, target_lang='fr', use_cache=True, max_chars=DEFAULT_MAX_CHARS,
+                         output_dir="translated_book", rate_limiter=None, verbose=True,
+                         backend='google', backend_options=None):
     """
     Reads a book from a local text file and translates it while preserving chapter structure.
     
     Args:
         file_path (str): Path to the local text file
         target_lang (str): Target language code (e.g., 'fr' for French)
+        use_cache (bool): Reuse translations of unchanged text from the on-disk translation memory
+        max_chars (int): Size budget of one request
+        output_dir (str): Where the chapters and full_translation.txt are written
+        rate_limiter (TokenBucket): Shared rate limit, e.g. across several books
+        verbose (bool): Print detected chapters and per-segment progress
+        backend (str or TranslationBackend): Backend name (see translation_backends) or a ready instance
+        backend_options (dict): Extra arguments when the backend is built by name
+    
+    Progress is checkpointed next to <output_dir>/full_translation.txt, so an
+    interrupted run resumes where it stopped and failed segments are retried.
+    
+    Returns:
+        dict: Summary with request/character counts and throughput
     """
-    print(f"Reading file: {file_path}")
+    log = print if verbose else (lambda *args, **kwargs: None)
+    summary = {'book': file_path, 'target': target_lang, 'complete': False,
+               'requests': 0, 'chars': 0, 'seconds': 0.0}
+    started = time.monotonic()
+    cache = None
+    translator = None
+    
+    log(f"Reading file: {file_path}")
     
     try:
         # Try different encodings if needed
@@ -22,7 +65,7 @@ def translate_local_book(file_path, target_lang='fr'):
             try:
                 with open(file_path, 'r', encoding=encoding) as file:
                     content = file.read()
-                print(f"Successfully read file with {encoding} encoding")
+                log(f"Successfully read file with {encoding} encoding")
                 break
             except UnicodeDecodeError:
                 continue
@@ -30,77 +73,102 @@ def translate_local_book(file_path, target_lang='fr'):
         if content is None:
             raise ValueError("Could not read the file with any of the attempted encodings")
     
-        # Pattern for detecting titles - multiple approaches combined
-        title_pattern = re.compile(
-            r'(?mx)'                     # m: multiline, x: verbose mode
-            r'(?:'                       # Start of non-capturing group for different title formats
-            r'^\s*[A-Z][A-Z\s]+[A-Z]\s*$'  # All caps title on its own line
-            r'|'                         # OR
-            r'^\s*[A-Z][a-zA-Z\s]+\s*\d+\s*$'  # Title followed by page number
-            r'|'                         # OR
-            r'^\s*[A-Z][a-zA-Z\s,]+\n'  # Title starting with capital, followed by newline
-            r')'
-        )
-        
-        # Split content and get titles
-        chapters = title_pattern.split(content)
-        chapter_titles = title_pattern.findall(content)
-        
-        # Remove empty chapters and clean titles
-        chapters = [chap.strip() for chap in chapters if chap.strip()]
-        chapter_titles = [title.strip() for title in chapter_titles if title.strip()]
+        # Find the chapters in one pass; spans are offsets into content, with
+        # the untitled preface first when there is one
+        spans = segment_chapters(content)
+        chapter_titles = [span.title for span in spans if span.title]
         
         # Print detected chapters for verification
-        print("\nDetected chapters:")
+        log("\nDetected chapters:")
         for i, title in enumerate(chapter_titles, 1):
-            print(f"{i}. {title}")
-        
-        # Ask for confirmation
-        response = input("\nProceed with translation? (yes/no): ").lower()
-        if response != 'yes':
-            print("Translation cancelled.")
-            return
+            log(f"{i}. {title}")
         
         # Prepare translator
-        translator = GoogleTranslator(source='auto', target=target_lang)
+        if not isinstance(backend, TranslationBackend):
+            backend = get_backend(backend, target=target_lang, **(backend_options or {}))
+        translator = RequestCounter(backend)
+        cache = TranslationCache() if use_cache else None
+        if not backend.remote:
+            rate_limiter = None
+        elif rate_limiter is None:
+            rate_limiter = TokenBucket(1.0)  # Respect API rate limits
         
         # Create output directory
-        output_dir = "translated_book"
         os.makedirs(output_dir, exist_ok=True)
         
-        # Translate and save
-        print("\nTranslating chapters...")
-        with open(f"{output_dir}/full_translation.txt", 'w', encoding='utf-8') as full_file:
+        # Split chapters into chunks of whole paragraphs/sentences; titles and
+        # chunks form one checkpointed job
+        chapter_chunks = [chunk_text(content, max_chars, span.start, span.end) for span in spans]
+        segments = chapter_titles + [chunk.text for chunks in chapter_chunks for chunk in chunks]
+        
+        full_path = f"{output_dir}/full_translation.txt"
+        job = TranslationJob(full_path, segments, {'source': 'auto', 'target': target_lang,
+                                                   'backend': backend.cache_name,
+                                                   'options': backend_options})
+        if job.discarded:
+            log("\nDiscarding the checkpoint of a run with another language or backend")
+        pending = job.pending()
+        if len(pending) < len(set(job.ids)):
+            log(f"\nResuming: {len(set(job.ids)) - len(pending)} segments already translated")
+        
+        # Translate whatever is not done yet; titles are packed into shared
+        # requests and each distinct title is translated once
+        log("\nTranslating chapters...")
+        results = translate_segments(translator, [segments[i] for i in pending], cache,
+                                     target=target_lang, backend=backend.cache_name,
+                                     rate_limiter=rate_limiter, max_chars=max_chars)
+        for n, (k, translation, segment_error) in enumerate(results, 1):
+            i = pending[k]
+            if segment_error is not None:
+                print(f"Failed to translate segment {i + 1}: {str(segment_error)}")
+                job.mark_failed(i, segment_error)
+            else:
+                log(f"Translated segment {n}/{len(pending)}")
+                job.mark_done(i, translation)
+        
+        failed = job.failed()
+        if failed:
+            print(f"\n{len(failed)} segments failed to translate; run again to retry them.")
+            print(f"Progress is kept in {job.manifest_path}")
+            return summary
+        
+        translations = job.translations()
+        translated_titles = translations[:len(chapter_titles)]
+        translated_chunks = translations[len(chapter_titles):]
+        
+        # Save
+        with open(full_path, 'w', encoding='utf-8') as full_file:
             # Write table of contents
             full_file.write("TABLE OF CONTENTS\n\n")
-            for i, title in enumerate(chapter_titles, 1):
-                translated_title = translator.translate(title.strip())
+            for i, translated_title in enumerate(translated_titles, 1):
                 full_file.write(f"{i}. {translated_title}\n")
             full_file.write("\n\n")
             
-            # Translate each chapter
-            for i, (chapter, title) in enumerate(zip(chapters, chapter_titles), 1):
-                print(f"Translating chapter {i}/{len(chapters)}")
-                
-                # Translate title
-                translated_title = translator.translate(title.strip())
-                
-                # Translate content in chunks
-                chunk_size = 4000  # Adjust based on API limits
-                chapter_chunks = [chapter[i:i+chunk_size] 
-                                for i in range(0, len(chapter), chunk_size)]
+            # Write each chapter
+            position = 0
+            titles = iter(translated_titles)
+            number = 0
+            for span, chunks in zip(spans, chapter_chunks):
+                translated_content = ''.join(
+                    translation + chunk.separator
+                    for translation, chunk in zip(translated_chunks[position:], chunks)
+                ).strip()
+                position += len(chunks)
                 
-                translated_chunks = []
-                for chunk in chapter_chunks:
-                    if chunk.strip():  # Only translate non-empty chunks
-                        translated_chunk = translator.translate(chunk.strip())
-                        translated_chunks.append(translated_chunk)
-                        time.sleep(1)  # Respect API rate limits
+                if not span.title:
+                    # Text before the first heading
+                    with open(f"{output_dir}/preface.txt", 'w', encoding='utf-8') as f:
+                        f.write(translated_content)
+                        f.write("\n\n")
+                    full_file.write(translated_content)
+                    full_file.write("\n\n")
+                    continue
                 
-                translated_content = ' '.join(translated_chunks)
+                number += 1
+                translated_title = next(titles)
                 
                 # Save individual chapter
-                with open(f"{output_dir}/chapter_{i}.txt", 'w', encoding='utf-8') as f:
+                with open(f"{output_dir}/chapter_{number}.txt", 'w', encoding='utf-8') as f:
                     f.write(f"{translated_title}\n\n")
                     f.write(translated_content)
                     f.write("\n\n")
@@ -109,15 +177,140 @@ def translate_local_book(file_path, target_lang='fr'):
                 full_file.write(f"{translated_title}\n\n")
                 full_file.write(translated_content)
                 full_file.write("\n\n")
+        job.finish()
+        summary['complete'] = True
                 
-        print(f"\nTranslation completed! Files saved in {output_dir}/")
-        print(f"- Individual chapters are in separate files")
-        print(f"- Complete translated book is in full_translation.txt")
+        log(f"\nTranslation completed! Files saved in {output_dir}/")
+        log(f"- Individual chapters are in separate files")
+        log(f"- Complete translated book is in full_translation.txt")
+        if cache is not None:
+            stats = cache.stats()
+            log(f"- Translation cache: {stats['hits']} hits, {stats['misses']} misses")
                 
     except FileNotFoundError:
         print(f"Error: Could not find file at {file_path}")
     except Exception as e:
         print(f"An error occurred: {str(e)}")
+    finally:
+        if cache is not None:
+            cache.close()
+        if translator is not None:
+            summary['requests'] = translator.requests
+            summary['chars'] = translator.chars
+        summary['seconds'] = time.monotonic() - started
+    return summary
+
+def find_books(paths, manifest=None):
+    """Book files from paths (files, or directories searched for *.txt) and a manifest listing one path per line"""
+    books = []
+    for path in paths:
+        if os.path.isdir(path):
+            books.extend(sorted(glob.glob(os.path.join(path, '*.txt'))))
+        else:
+            books.append(path)
+    if manifest:
+        base = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    books.append(os.path.join(base, line))
+    return books
+
+def output_names(books):
+    """
+    Output directory name of each book: its file name, with a short hash of its
+    absolute path when books in different directories share a file name
+    """
+    paths = {}
+    for book in books:
+        name = os.path.splitext(os.path.basename(book))[0]
+        paths.setdefault(name, set()).add(os.path.abspath(book))
+    names = {}
+    for book in books:
+        name = os.path.splitext(os.path.basename(book))[0]
+        if len(paths[name]) > 1:
+            name = f"{name}-{cache_key(os.path.abspath(book))[:8]}"
+        names[book] = name
+    return names
+
+def translate_books(books, target_langs, output_dir="translated_books", workers=4,
+                    requests_per_second=1.0, use_cache=True, max_chars=DEFAULT_MAX_CHARS,
+                    backend='google', backend_options=None):
+    """
+    Translates every book into every target language, several at a time.
+    
+    All books share one rate limiter, so the total request rate stays at
+    requests_per_second however many run concurrently. A local backend is
+    loaded once per target language and shared by all books; '{target}' in a
+    string backend option is replaced by the language. Each book/language
+    goes to <output_dir>/<book name>/<lang>/ (see output_names); a book listed
+    twice is translated once.
+    """
+    rate_limiter = TokenBucket(requests_per_second)
+    backends = {target_lang: backend for target_lang in target_langs}
+    if not get_backend_class(backend).remote:
+        for target_lang in target_langs:
+            options = {key: value.format(target=target_lang) if isinstance(value, str) else value
+                       for key, value in (backend_options or {}).items()}
+            backends[target_lang] = get_backend(backend, target=target_lang, **options)
+    
+    # Two runs sharing an output directory would share one checkpoint
+    books = list({os.path.abspath(book): book for book in books}.values())
+    names = output_names(books)
+    
+    def run(book, target_lang):
+        name = names[book]
+        print(f"Starting {name} -> {target_lang}")
+        summary = translate_local_book(
+            book, target_lang, use_cache=use_cache, max_chars=max_chars,
+            output_dir=os.path.join(output_dir, name, target_lang),
+            rate_limiter=rate_limiter, verbose=False,
+            backend=backends[target_lang], backend_options=backend_options
+        )
+        print(f"Finished {name} -> {target_lang}: "
+              f"{'done' if summary['complete'] else 'incomplete'}")
+        return summary
+    
+    runs = [(book, target_lang) for book in books for target_lang in target_langs]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        return list(executor.map(lambda args: run(*args), runs))
+
+def print_summary(summaries):
+    print(f"\n{'Book':40} {'Lang':5} {'Status':10} {'Requests':>8} {'Chars':>10} "
+          f"{'Seconds':>8} {'Chars/s':>9} {'Req/s':>6}")
+    for summary in summaries:
+        seconds = summary['seconds'] or 1e-9
+        name = os.path.basename(summary['book'])[:40]
+        status = 'done' if summary['complete'] else 'incomplete'
+        print(f"{name:40} {summary['target']:5} {status:10} {summary['requests']:8d} "
+              f"{summary['chars']:10d} {summary['seconds']:8.1f} "
+              f"{summary['chars'] / seconds:9.1f} {summary['requests'] / seconds:6.2f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Translate local books, preserving chapter structure")
+    parser.add_argument('books', nargs='*', help="Book files or directories of .txt books")
+    parser.add_argument('--manifest', help="File listing one book path per line")
+    parser.add_argument('--target', nargs='+', default=['fr'], help="Target language codes")
+    parser.add_argument('--output-dir', default="translated_books")
+    parser.add_argument('--workers', type=int, default=4, help="Books translated at the same time")
+    parser.add_argument('--rate', type=float, default=1.0, help="Requests per second across all books")
+    parser.add_argument('--max-chars', type=int, default=DEFAULT_MAX_CHARS)
+    parser.add_argument('--no-cache', action='store_true', help="Don't use the translation memory")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='google')
+    parser.add_argument('--model-dir', help="Model for a local backend; '{target}' is replaced by the language")
+    args = parser.parse_args(argv)
+    
+    books = find_books(args.books, args.manifest)
+    if not books:
+        parser.error("no books given")
+    
+    backend_options = {'model_dir': args.model_dir} if args.model_dir else None
+    summaries = translate_books(books, args.target, args.output_dir, args.workers,
+                                args.rate, not args.no_cache, args.max_chars,
+                                args.backend, backend_options)
+    print_summary(summaries)
+    return 0 if all(summary['complete'] for summary in summaries) else 1
 
-# Example usage:
-translate_local_book('/Users/mac-Z22HBENM/Desktop/Learning/History/Timeline/ai_scripts/examples/morocco-that-was_Walter-Harris.txt', 'ar')
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(main())